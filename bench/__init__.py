@@ -0,0 +1,8 @@
+"""
+Offline benchmark harness for the TQM dashboard.
+
+    python -m bench.run --scales 1000,10000,100000 --latency-ms 0 --out bench/results.json
+
+Runs main.py against a local stub Daraz gateway (bench.fake_daraz) and a SQLite-backed
+stand-in for pymssql (bench.fake_mssql), so no live Daraz API or Azure SQL is needed.
+"""
@@ -0,0 +1,303 @@
+"""
+Stub Lazop/Daraz gateway serving synthetic payloads for:
+
+    /orders/get, /order/get, /order/items/get, /logistic/order/trace,
+    /finance/transaction/details/get (per trade_order_id, or paged by date range)
+
+Orders are generated lazily and deterministically from their index, so a 100k-order
+store costs nothing until it is read. Order i has status STATUSES[i % len(STATUSES)]
+(unless set in store.status_overrides) and order_id ORDER_ID_BASE + i.
+
+send_push() is a local stub for Daraz push notifications (POST /webhooks/daraz) and
+stub_image_fetcher() stands in for the product image CDN (TQM_IMAGE_FETCHER).
+"""
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from urllib.request import Request, urlopen
+
+STATUSES = ["unpaid", "pending", "ready_to_ship", "shipped", "delivered",
+            "returned", "failed", "topack", "toship", "packed"]
+TRACE_TITLES = {
+    "shipped": "In Transit",
+    "delivered": "Delivered",
+    "returned": "Package Returned",
+    "failed": "Buyer Delivery Failed",
+}
+ORDER_ID_BASE = 200000000
+SKU_POOL = 300
+FIRST_DATE = date(2025, 7, 6)
+
+
+def sku_for(n: int) -> str:
+    return f"BENCH-SKU-{n % SKU_POOL:04d}"
+
+
+class SyntheticStore(object):
+    def __init__(self, n_orders: int, seed: int = 7):
+        self.n_orders = n_orders
+        self.seed = seed
+        self.status_overrides = {}  # index -> status, e.g. to simulate a push-driven change
+
+    def status(self, i: int) -> str:
+        return self.status_overrides.get(i) or STATUSES[i % len(STATUSES)]
+
+    def _rng(self, i: int) -> random.Random:
+        return random.Random(self.seed * 1000003 + i)
+
+    def index_of(self, order_id) -> int | None:
+        try:
+            i = int(order_id) - ORDER_ID_BASE
+        except (TypeError, ValueError):
+            return None
+        return i if 0 <= i < self.n_orders else None
+
+    def order(self, i: int) -> dict:
+        rng = self._rng(i)
+        created = FIRST_DATE + timedelta(days=i % 90)
+        return {
+            "order_id": ORDER_ID_BASE + i,
+            "created_at": f"{created.isoformat()} 10:{i % 60:02d}:00 +0500",
+            "price": f"{rng.randint(800, 9000)}.00",
+            "customer_first_name": f"Customer{i}",
+            "customer_last_name": "",
+            "address_shipping": {
+                "first_name": f"Customer{i}", "last_name": "",
+                "address1": f"House {rng.randint(1, 999)}, Street {rng.randint(1, 99)}",
+                "city": rng.choice(["Lahore", "Karachi", "Islamabad", "Multan"]),
+                "post_code": "", "country": "Pakistan",
+                "phone": f"03{rng.randint(100000000, 999999999)}",
+            },
+            "statuses": [self.status(i)],
+        }
+
+    def items(self, i: int) -> list[dict]:
+        rng = self._rng(i)
+        status = self.status(i)
+        booked = status not in ("unpaid", "pending", "topack")
+        out = []
+        for n in range(rng.randint(1, 3)):
+            sku = sku_for(rng.randint(0, SKU_POOL * 2))
+            out.append({
+                "name": f"Bench Product {sku[-4:]}",
+                "variation": "Color family:Black",
+                "seller_sku": sku,
+                "product_main_image": f"https://example.invalid/img/{sku}.jpg",
+                "tracking_code": f"TRK{ORDER_ID_BASE + i}{n}" if booked else "",
+                "status": status,
+            })
+        return out
+
+    def trace(self, i: int) -> list[dict]:
+        title = TRACE_TITLES.get(self.status(i))
+        if not title:
+            return []
+        pkgs = []
+        for it in self.items(i):
+            if it["tracking_code"]:
+                pkgs.append({
+                    "tracking_number": it["tracking_code"],
+                    "logistic_detail_info_list": [{"title": "Picked Up"}, {"title": title}],
+                })
+        return [{"package_detail_info_list": pkgs}]
+
+    def finance(self, i: int) -> list[dict]:
+        status = self.status(i)
+        if status not in ("delivered", "returned", "failed", "shipped"):
+            return []
+        rng = self._rng(i)
+        price = int(self.order(i)["price"].split(".")[0])
+        paid = "Yes" if status == "delivered" and rng.random() < 0.7 else "No"
+        tx_date = self.finance_date(i)
+        # weekly statements, labelled by the Monday after the week they cover
+        stmt_week = (tx_date + timedelta(days=7 - tx_date.weekday())).strftime("%Y-%m-%d")
+        rows = [
+            ("Product Price Paid by Buyer", price),
+            ("Commission", -round(price * 0.12)),
+            ("Payment Fee", -round(price * 0.02)),
+            ("Shipping Fee (Paid By Customer)", 150),
+        ]
+        return [{
+            "fee_name": name, "transaction_type": "Orders-Sales", "amount": f"{amt}.00",
+            "paid_status": paid, "statement": f"{stmt_week} - Weekly Statement",
+            "transaction_date": tx_date.strftime("%d %b %Y"),
+            "transaction_number": f"{ORDER_ID_BASE + i}-{n}",
+            "order_no": str(ORDER_ID_BASE + i),
+            "trade_order_id": str(ORDER_ID_BASE + i),
+        } for n, (name, amt) in enumerate(rows)]
+
+    def finance_date(self, i: int) -> date:
+        return FIRST_DATE + timedelta(days=(i % 90) + 7)
+
+    def finance_page(self, start: date, end: date, offset: int, limit: int) -> list[dict]:
+        """All orders' finance rows dated start..end (inclusive), paged like the real API."""
+        rows = []
+        for i in range(self.n_orders):
+            if start <= self.finance_date(i) <= end:
+                rows.extend(self.finance(i))
+        return rows[offset:offset + limit]
+
+    def orders_page(self, status: str | None, offset: int, limit: int) -> list[dict]:
+        if status in STATUSES:
+            step, first = len(STATUSES), STATUSES.index(status)
+        elif status:
+            return []
+        else:
+            step, first = 1, 0
+        total = max(0, (self.n_orders - first + step - 1) // step)
+        return [self.order(first + j * step) for j in range(offset, min(offset + limit, total))]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    gateway = None  # set by FakeDarazGateway
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, params: dict):
+        gw = self.gateway
+        if gw.latency_s:
+            time.sleep(gw.latency_s)
+        api = urlparse(self.path).path
+        if api.startswith(gw.prefix):
+            api = api[len(gw.prefix):]
+        self._reply(gw.respond(api, {k: v[0] for k, v in params.items()}))
+
+    def do_GET(self):
+        self._handle(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self._handle(parse_qs(self.rfile.read(length).decode()))
+
+
+class FakeDarazGateway(object):
+    """
+    Local HTTP gateway. Use as a context manager:
+
+        with FakeDarazGateway(n_orders=10000, latency_ms=20) as gw:
+            os.environ["DARAZ_ENDPOINT"] = gw.endpoint
+    """
+    prefix = "/rest"
+
+    def __init__(self, n_orders: int = 1000, latency_ms: float = 0, seed: int = 7):
+        self.store = SyntheticStore(n_orders, seed)
+        self.latency_s = latency_ms / 1000.0
+        self.requests = 0
+        self._lock = threading.Lock()
+        handler = type("Handler", (_Handler,), {"gateway": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{self.prefix}"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def respond(self, api: str, p: dict) -> dict:
+        """JSON body for one API call (p: application parameters as strings)."""
+        self.count()
+        store = self.store
+        i = store.index_of(p.get("order_id") or p.get("trade_order_id"))
+
+        if api == "/orders/get":
+            orders = store.orders_page(p.get("status"), int(p.get("offset") or 0), int(p.get("limit") or 50))
+            return {"code": "0", "request_id": "bench", "data": {"count": len(orders), "orders": orders}}
+        if api == "/order/get":
+            return {"code": "0", "request_id": "bench", "data": store.order(i) if i is not None else {}}
+        if api == "/order/items/get":
+            return {"code": "0", "request_id": "bench", "data": store.items(i) if i is not None else []}
+        if api == "/logistic/order/trace":
+            data = store.trace(i) if i is not None else []
+            return {"code": "0", "request_id": "bench", "result": {"success": True, "data": data}}
+        if api == "/finance/transaction/details/get":
+            if p.get("trade_order_id"):
+                data = store.finance(i) if i is not None else []
+            else:
+                data = store.finance_page(date.fromisoformat(p["start_time"]), date.fromisoformat(p["end_time"]),
+                                          int(p.get("offset") or 0), int(p.get("limit") or 500))
+            return {"code": "0", "request_id": "bench", "data": data}
+        return {"code": "InvalidApi", "type": "ISP", "message": f"Unknown api {api}", "request_id": "bench"}
+
+    def direct_journal(self):
+        """
+        A replay journal answering from this gateway in-process (no HTTP, no latency).
+        Install it as a LazopClient's journal to run the real API-handling code paths
+        at scales where a round trip per call would dominate what is being measured.
+        """
+        return _DirectJournal(self)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _DirectJournal(object):
+    mode = "replay"
+
+    def __init__(self, gateway: FakeDarazGateway):
+        self.gateway = gateway
+
+    def __len__(self):
+        return 0
+
+    def lookup(self, api, parameters):
+        return self.gateway.respond(api, {k: str(v) for k, v in parameters.items()})
+
+
+def send_push(url: str, app_key: str, app_secret: str, order_id, status: str = "delivered") -> dict:
+    """
+    Sign and POST one Daraz-style trade order push message, e.g.
+        send_push("http://127.0.0.1:5000/webhooks/daraz", key, secret, 200000042)
+    """
+    body = json.dumps({
+        "seller_id": "bench-seller",
+        "message_type": 0,
+        "data": {"trade_order_id": str(order_id), "order_status": status,
+                 "status_update_time": int(time.time())},
+        "timestamp": int(time.time() * 1000),
+    }).encode()
+    signature = hmac.new(app_secret.encode(), app_key.encode() + body, digestmod=hashlib.sha256).hexdigest()
+    req = Request(url, data=body, method="POST",
+                  headers={"Content-Type": "application/json", "Authorization": signature})
+    with urlopen(req, timeout=10) as resp:
+        return json.loads(resp.read() or b"{}")
+
+
+# 1x1 GIF; the fetcher contract is url -> (bytes, content_type)
+_STUB_GIF = bytes.fromhex("47494638396101000100800000000000ffffff21f90401000000002c00000000010001000002024401003b")
+
+
+def stub_image_fetcher(url: str) -> tuple[bytes, str]:
+    """Offline product image fetcher: TQM_IMAGE_FETCHER=bench.fake_daraz:stub_image_fetcher"""
+    return _STUB_GIF, "image/gif"
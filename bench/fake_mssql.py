@@ -0,0 +1,187 @@
+"""
+SQLite-backed stand-in for the parts of pymssql that main.py uses.
+
+Install it before importing main:
+
+    import sys
+    from bench import fake_mssql
+    sys.modules["pymssql"] = fake_mssql
+    fake_mssql.reset(costs=..., payments=...)
+
+All connections share one in-memory database. The T-SQL that main.py issues is
+translated to SQLite on the fly: %s placeholders, TOP (n), WITH (HOLDLOCK) and the
+MERGE ... USING (VALUES ...) upsert shape.
+"""
+import re
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+Error = sqlite3.Error
+
+_URI = "file:tqm_bench?mode=memory&cache=shared"
+_anchor = None  # keeps the shared in-memory DB alive between connections
+connects = 0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tqm_product_costs (
+    item_key NVARCHAR(255) PRIMARY KEY,
+    product_cost DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    packaging DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    vendor NVARCHAR(64),
+    version BIGINT NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS vendor_payments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id NVARCHAR(128) NOT NULL,
+    vendor NVARCHAR(64) NOT NULL,
+    amount DECIMAL(12, 2) NOT NULL,
+    payment_date DATE NOT NULL,
+    timestamp DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'),
+    balance DECIMAL(14, 2),
+    version BIGINT NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tqm_finance_transactions (
+    tx_key CHAR(40) PRIMARY KEY,
+    account NVARCHAR(64) NOT NULL,
+    statement NVARCHAR(128) NOT NULL,
+    trade_order_id NVARCHAR(32) NOT NULL,
+    order_item_id NVARCHAR(32) NOT NULL,
+    transaction_date DATE,
+    transaction_type NVARCHAR(128) NOT NULL,
+    fee_name NVARCHAR(128) NOT NULL,
+    amount DECIMAL(14, 2) NOT NULL,
+    paid BIT NOT NULL,
+    ingested_at DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now') || '000')
+);
+CREATE INDEX IF NOT EXISTS ix_finance_statement ON tqm_finance_transactions (account, statement, trade_order_id);
+CREATE INDEX IF NOT EXISTS ix_finance_order ON tqm_finance_transactions (trade_order_id);
+CREATE TABLE IF NOT EXISTS tqm_data_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version BIGINT NOT NULL
+);
+INSERT INTO tqm_data_version (id, version) VALUES (1, 0);
+"""
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+# One canonical DATETIME text format for stored defaults and bound parameters, so the
+# string comparisons SQLite does on them (e.g. the payment keyset cursor) order correctly
+TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+sqlite3.register_adapter(datetime, lambda d: d.strftime(TS_FORMAT))
+sqlite3.register_converter("DECIMAL", lambda b: Decimal(b.decode()))
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()[:10]))
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+
+_TOP = re.compile(r"\bSELECT\s+TOP\s*\(?\s*(\d+)\s*\)?", re.I)
+_MERGE = re.compile(
+    r"MERGE\s+(\w+).*?USING\s*\(\s*VALUES\s*(.*?)\)\s*AS\s+\w+\s*\(([^)]*)\)\s*ON\s+\w+\.(\w+)\s*=",
+    re.I | re.S,
+)
+
+
+def translate(sql: str) -> str:
+    sql = sql.replace("%s", "?")
+    sql = re.sub(r"WITH\s*\(\s*HOLDLOCK\s*\)", "", sql, flags=re.I)
+
+    m = _MERGE.search(sql)
+    if m:
+        table, values, cols, key = m.group(1), m.group(2), m.group(3), m.group(4)
+        col_list = [c.strip() for c in cols.split(",")]
+        updates = ", ".join(f"{c} = excluded.{c}" for c in col_list if c != key)
+        return (f"INSERT INTO {table} ({', '.join(col_list)}) VALUES {values} "
+                f"ON CONFLICT({key}) DO UPDATE SET {updates};")
+
+    m = _TOP.search(sql)
+    if m:
+        sql = _TOP.sub("SELECT", sql, count=1).rstrip().rstrip(";")
+        sql = f"{sql} LIMIT {m.group(1)};"
+    return sql
+
+
+class Cursor(object):
+    def __init__(self, cur):
+        self._cur = cur
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def execute(self, sql, params=()):
+        self._cur.execute(translate(sql), tuple(params or ()))
+
+    def executemany(self, sql, seq):
+        self._cur.executemany(translate(sql), [tuple(p) for p in seq])
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+
+class Connection(object):
+    def __init__(self, latency_s: float = 0.0):
+        if latency_s:
+            time.sleep(latency_s)
+        self._conn = sqlite3.connect(_URI, uri=True, detect_types=sqlite3.PARSE_DECLTYPES,
+                                     check_same_thread=False)
+
+    def cursor(self):
+        return Cursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+CONNECT_LATENCY_S = 0.0
+
+
+def connect(*args, **kwargs):
+    global connects
+    connects += 1
+    return Connection(CONNECT_LATENCY_S)
+
+
+def reset(costs: dict | None = None, payments: list[tuple] | None = None):
+    """
+    Recreate the schema and seed it.
+    costs: {item_key: (product_cost, packaging, vendor)}
+    payments: [(user_id, vendor, amount, payment_date), ...]
+    """
+    global _anchor, connects
+    if _anchor is None:
+        _anchor = sqlite3.connect(_URI, uri=True, check_same_thread=False)
+    _anchor.executescript("DROP TABLE IF EXISTS tqm_product_costs; DROP TABLE IF EXISTS vendor_payments; "
+                          "DROP TABLE IF EXISTS tqm_data_version; DROP TABLE IF EXISTS tqm_finance_transactions;")
+    _anchor.executescript(SCHEMA)
+    _anchor.executemany(
+        "INSERT INTO tqm_product_costs (item_key, product_cost, packaging, vendor) VALUES (?, ?, ?, ?)",
+        [(k, str(v[0]), str(v[1]), v[2]) for k, v in (costs or {}).items()],
+    )
+    # seeded payments are a minute apart, oldest first, with running balances per (user, vendor)
+    balances, seeded = {}, []
+    first_ts = datetime(2025, 8, 1, 9, 0, 0)
+    for n, (u, v, a, d) in enumerate(payments or []):
+        balances[(u, v)] = balances.get((u, v), Decimal("0")) + Decimal(str(a))
+        seeded.append((u, v, str(a), d, first_ts + timedelta(minutes=n), str(balances[(u, v)])))
+    _anchor.executemany(
+        "INSERT INTO vendor_payments (user_id, vendor, amount, payment_date, timestamp, balance) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        seeded,
+    )
+    _anchor.commit()
+    connects = 0
@@ -0,0 +1,224 @@
+"""
+Benchmark runner: cold start, per-call API paths, warm render, stats and search at several scales.
+
+    python -m bench.run                                   # 1k, 10k, 100k orders
+    python -m bench.run --scales 1000 --latency-ms 25 --out bench/results.json
+
+Cold start pages the full order list and fetches items + trace per order over HTTP from
+the stub gateway (100k orders takes several minutes). The render benchmarks then run on
+that hydrated cache, with the first render filling finance through the real code path.
+
+Results are written as JSON for regression tracking (compare runs with any JSON diff).
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bench import fake_mssql
+from bench.fake_daraz import FakeDarazGateway, SKU_POOL, STATUSES, sku_for
+
+VENDORS = ["Tick Bags", "Sleek Space", "Other"]
+
+
+def _seed_db():
+    # Leave every 10th SKU without a cost so needs_cost paths are exercised
+    costs = {sku_for(n): (f"{400 + n}.00", "35.00", VENDORS[n % len(VENDORS)])
+             for n in range(SKU_POOL) if n % 10}
+    payments = [("default-user-id", VENDORS[n % 2], f"{5000 + n * 10}.00", f"2025-08-{1 + n % 28:02d}")
+                for n in range(200)]
+    fake_mssql.reset(costs=costs, payments=payments)
+
+
+def _fresh_import_main(endpoint: str):
+    os.environ["DARAZ_ENDPOINT"] = endpoint
+    os.environ.setdefault("DARAZ_APP_KEY", "bench-key")
+    os.environ.setdefault("DARAZ_APP_SECRET", "bench-secret")
+    os.environ.setdefault("DARAZ_ACCESS_TOKEN", "bench-token")
+    os.environ.setdefault("DARAZ_SAFETY_POLL_SECONDS", "0")
+    os.environ.setdefault("TQM_IMAGE_FETCHER", "bench.fake_daraz:stub_image_fetcher")
+    os.environ.setdefault("TQM_THUMB_DIR", os.path.join(tempfile.gettempdir(), "tqm-bench-thumbs"))
+    sys.modules["pymssql"] = fake_mssql
+    sys.modules.pop("main", None)
+    return importlib.import_module("main")
+
+
+def _timeit(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {
+        "n": repeat,
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+    }
+
+
+def _check_payment_paging(main, page_size: int = 37) -> dict:
+    """
+    Walk /api/get_payments page by page (all vendors, then each vendor) and compare with
+    the seeded payments: every row exactly once, newest first, balances = running sums.
+    """
+    http = main.app.test_client()
+    out = {"ok": True, "pages": 0, "rows": 0, "errors": []}
+    with fake_mssql.Connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, vendor, amount FROM vendor_payments ORDER BY timestamp, id;")
+        seeded = cur.fetchall()
+    running, expected = {}, {}
+    for pid, vendor, amount in seeded:
+        running[vendor] = running.get(vendor, 0) + amount
+        expected[pid] = running[vendor]
+
+    for vendor in [None] + VENDORS:
+        want = [pid for pid, v, _ in reversed(seeded) if vendor is None or v == vendor]
+        got, cursor = [], None
+        while True:
+            q = {"limit": page_size, **({"cursor": cursor} if cursor else {}), **({"vendor": vendor} if vendor else {})}
+            body = http.get("/api/get_payments", query_string=q).get_json()
+            out["pages"] += 1
+            got.extend(row["id"] for row in body["history"])
+            for row in body["history"]:
+                if main._d(row["balance"]) != expected.get(row["id"]):
+                    out["errors"].append(f"{vendor or 'all'}: balance of payment {row['id']} is {row['balance']}")
+            cursor = body["next_cursor"]
+            if not cursor or len(got) > len(want):
+                break
+        if got != want:
+            out["errors"].append(f"{vendor or 'all'}: paged {len(got)} row(s), expected {len(want)} in order")
+        out["rows"] += len(got)
+    out["ok"] = not out["errors"]
+    if not out["ok"]:
+        print(f"[bench] payment paging FAILED: {out['errors'][:5]}")
+    return out
+
+
+def _bench_search(main, http, repeat: int) -> dict:
+    """/api/search latency for broad, multi-term and exact queries over the hydrated index."""
+    sample = main.RAW_ORDERS_CACHE[len(main.RAW_ORDERS_CACHE) // 2]
+    phone = "".join(ch for ch in str((sample.get("customer") or {}).get("phone") or "") if ch.isdigit())
+    queries = {
+        "city": "lahore",
+        "title": "bench",
+        "address": "house 5 lahore",
+        "name_prefix": "customer12",
+        "phone_intl": f"+92 {phone[1:4]} {phone[4:]}",
+        "order_id": sample["order_id"],
+    }
+    out = {}
+    for label, q in queries.items():
+        main.SEARCH_INDEX.search(q, 20)  # first use ranks the tokens' postings
+        out[label] = _timeit(lambda q=q: main.SEARCH_INDEX.search(q, 20), repeat)
+        out[label]["q"] = q
+    resp = http.get("/api/search", query_string={"q": queries["phone_intl"]}).get_json()
+    out["phone_found"] = any(r["order_id"] == sample["order_id"] for r in resp.get("results", []))
+    return out
+
+
+def bench_scale(n_orders: int, latency_ms: float, repeat: int, sample: int) -> dict:
+    out = {"orders": n_orders}
+    _seed_db()
+    with FakeDarazGateway(n_orders=n_orders, latency_ms=latency_ms) as gw:
+        # --- cold start: import main (serves immediately), then background hydration ---
+        t0 = time.perf_counter()
+        main = _fresh_import_main(gw.endpoint)
+        import_ms = (time.perf_counter() - t0) * 1000
+        while not main._hydration_status()["ready"] and main.HYDRATION["state"] != "error":
+            time.sleep(0.005)
+        out["cold_start"] = {
+            "import_ms": round(import_ms, 3),
+            "ms": round((time.perf_counter() - t0) * 1000, 3),  # time until /readyz would report ready
+            "api_requests": gw.requests,
+            "db_connects": fake_mssql.connects,
+            "orders_loaded": len(main.RAW_ORDERS_CACHE),
+            "load_error": main.LOAD_ERROR,
+        }
+
+        # --- individual API paths ---
+        sample_ids = [str(200000000 + i) for i in range(0, n_orders, max(1, n_orders // sample))][:sample]
+        out["orders_list"] = _timeit(
+            lambda: main._orders_list(main.CREATED_AFTER_ISO, statuses=main.STATUSES_EXCEPT_CANCELED), 3)
+        it = iter(sample_ids * repeat)
+        out["items_with_tracking"] = _timeit(lambda: main._items_with_tracking(next(it), ["shipped"]),
+                                             len(sample_ids))
+        it = iter(sample_ids * repeat)
+        out["finance_for_order"] = _timeit(lambda: main._finance_for_order(next(it), "2025-07-10", "1500.00"),
+                                           len(sample_ids))
+
+        # --- first / warm render over the hydrated cache ---
+        # The first render fills each order's finance through the real _ensure_finance path.
+        # Calls are answered in-process from here on: 100k HTTP round trips are not what the
+        # render benchmark is measuring (cold_start above covers the gateway).
+        for acct in main.ACCOUNTS.values():
+            acct.client._journal = gw.direct_journal()
+        main.app.testing = True
+        http = main.app.test_client()
+        requests_before = gw.requests
+        t0 = time.perf_counter()
+        first = http.get("/")
+        out["first_render"] = {"ms": round((time.perf_counter() - t0) * 1000, 3),
+                               "status": first.status_code, "bytes": len(first.data),
+                               "server_timing": first.headers.get("Server-Timing", ""),
+                               "api_requests": gw.requests - requests_before}
+        out["warm_render"] = _timeit(lambda: http.get("/"), repeat)
+        last = http.get("/")
+        out["warm_render"]["server_timing"] = last.headers.get("Server-Timing", "")
+
+        out["payments_paging"] = _check_payment_paging(main)
+        out["payments_page"] = _timeit(lambda: http.get("/api/get_payments?limit=50"), repeat)
+
+        out["search"] = _bench_search(main, http, repeat)
+
+        view = main._build_runtime_view(main.RAW_ORDERS_CACHE)
+        out["build_view"] = _timeit(lambda: main._build_runtime_view(main.RAW_ORDERS_CACHE), repeat)
+        out["compute_stats"] = _timeit(lambda: main._compute_stats(view), repeat)
+    return out
+
+
+def main_cli(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scales", default="1000,10000,100000", help="comma-separated order counts")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="stub gateway latency per request")
+    ap.add_argument("--db-latency-ms", type=float, default=0.0, help="fake DB connect latency")
+    ap.add_argument("--repeat", type=int, default=5, help="repetitions for timed sections")
+    ap.add_argument("--sample", type=int, default=50, help="orders sampled for per-call API benchmarks")
+    ap.add_argument("--out", default=f"bench/results-{datetime.now():%Y%m%d-%H%M%S}.json")
+    args = ap.parse_args(argv)
+
+    fake_mssql.CONNECT_LATENCY_S = args.db_latency_ms / 1000.0
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latency_ms": args.latency_ms,
+            "db_latency_ms": args.db_latency_ms,
+            "statuses": STATUSES,
+        },
+        "results": {},
+    }
+    for scale in [int(s) for s in args.scales.split(",") if s.strip()]:
+        print(f"[bench] {scale} orders ...")
+        report["results"][str(scale)] = res = bench_scale(scale, args.latency_ms, args.repeat, args.sample)
+        slowest = max((v for v in res["search"].values() if isinstance(v, dict)), key=lambda v: v["median_ms"])
+        print(f"[bench] {scale}: cold start {res['cold_start']['ms']} ms, "
+              f"warm render {res['warm_render']['median_ms']} ms, stats {res['compute_stats']['median_ms']} ms, "
+              f"slowest search {slowest['median_ms']} ms ({slowest['q']!r})")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[bench] wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,77 @@
+"""
+Rendered dashboard fragments: per-order table rows and their ORDERS_DATA JSON, plus a
+small LRU for everything else (stats cards).
+
+Rows live in one slot per order_id holding (version, row html, row json). A changed
+order finds a different version in its slot and overwrites it in place, so memory is
+bounded by the number of orders and a full-table render can never evict rows it is
+about to reuse (which an LRU smaller than the table would do on every pass).
+"""
+import threading
+from collections import OrderedDict
+
+ROW_HTML = 1
+ROW_JSON = 2
+
+
+class FragmentCache(object):
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._rows = {}  # order_id -> [version, row html or None, row json or None]
+        self._entries = OrderedDict()  # key -> rendered str, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._rows) + len(self._entries)
+
+    def row_part(self, order_id: str, version, part: int, render) -> str:
+        """One part (ROW_HTML / ROW_JSON) of an order's row at `version`, render() on a miss."""
+        with self._lock:
+            slot = self._rows.get(order_id)
+            if slot is not None and slot[0] == version and slot[part] is not None:
+                self.hits += 1
+                return slot[part]
+            self.misses += 1
+        value = render()
+        with self._lock:
+            slot = self._rows.get(order_id)
+            if slot is None or slot[0] != version:
+                slot = self._rows[order_id] = [version, None, None]
+            slot[part] = value
+        return value
+
+    def discard_row(self, order_id: str):
+        with self._lock:
+            self._rows.pop(order_id, None)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: str):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_render(self, key, render) -> str:
+        """Cached fragment for `key`, calling render() (outside the lock) on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = render()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._entries.clear()
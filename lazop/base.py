@@ -10,28 +10,22 @@ import time
 import hmac
 import hashlib
 import json
+import atexit
 import mimetypes
 import itertools
 import random
 import logging
+import logging.handlers
 import os
 from os.path import expanduser
+import queue
 import socket
 import platform
+import threading
 
-# dir = os.getenv('HOME')
-dir = expanduser("~")
-isExists = os.path.exists(dir + "/logs")
-if not isExists:
-    os.makedirs(dir + "/logs") 
 logger = logging.getLogger(__name__)
-logger.setLevel(level = logging.ERROR)
-handler = logging.FileHandler(dir + "/logs/lazopsdk.log." + time.strftime("%Y-%m-%d", time.localtime()))
-handler.setLevel(logging.ERROR)
-# formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-formatter = logging.Formatter('%(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
+logger.setLevel(level = logging.INFO)
+logger.propagate = False
 
 P_SDK_VERSION = "lazop-sdk-python-20181207"
 
@@ -56,6 +50,13 @@ P_API_GATEWAY_URL_PH = 'https://api.lazada.com.ph/rest'
 P_API_GATEWAY_URL_ID = 'https://api.lazada.co.id/rest'
 P_API_AUTHORIZATION_URL = 'https://auth.lazada.com/rest'
 
+P_JOURNAL_OFF = "off"
+P_JOURNAL_RECORD = "record"
+P_JOURNAL_REPLAY = "replay"
+
+# never written to (or matched in) the journal: volatile or secret
+P_JOURNAL_EXCLUDED = (P_SIGN, P_TIMESTAMP, P_ACCESS_TOKEN)
+
 P_LOG_LEVEL_DEBUG = "DEBUG"
 P_LOG_LEVEL_INFO = "INFO"
 P_LOG_LEVEL_ERROR = "ERROR"
@@ -84,13 +85,237 @@ def mixStr(pstr):
     else:
         return str(pstr)
 
-def logApiError(appkey, sdkVersion, requestUrl, code, message):
-    localIp = socket.gethostbyname(socket.gethostname())
-    platformType = platform.platform()
-    logger.error("%s^_^%s^_^%s^_^%s^_^%s^_^%s^_^%s^_^%s" % (
-        appkey, sdkVersion,
-        time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
-        localIp, platformType, requestUrl, code, message))
+#===============================================================================
+# Logging: records go through a bounded in-memory queue to a QueueListener thread
+# that owns the (rotating) file handler, so API/sync threads never touch the disk.
+# Defaults come from the environment and can be overridden with configure_logging():
+#   LAZOP_LOG_DIR            directory of lazopsdk.log (default ~/logs)
+#   LAZOP_LOG_FORMAT         "kv" (key=value, default) or "json"
+#   LAZOP_LOG_ROTATE         "size" (default) or "time" (midnight)
+#   LAZOP_LOG_MAX_BYTES      size rotation threshold (default 10 MB)
+#   LAZOP_LOG_BACKUPS        rotated files to keep (default 7)
+#   LAZOP_LOG_FLOOD_BURST    errors per api+code per second logged unsampled (default 5)
+#   LAZOP_LOG_SAMPLE_RATE    fraction of errors logged beyond the burst (default 0.01)
+#===============================================================================
+P_LOG_FORMAT_KV = "kv"
+P_LOG_FORMAT_JSON = "json"
+P_LOG_ROTATE_SIZE = "size"
+P_LOG_ROTATE_TIME = "time"
+P_LOG_QUEUE_SIZE = 10000
+
+# never written to the log: the signed URL would otherwise leak the seller's token
+P_LOG_REDACTED = (P_SIGN, P_ACCESS_TOKEN)
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+class LazopLogFormatter(logging.Formatter):
+    #===========================================================================
+    # One line per record: key=value pairs (or a JSON object) built from the
+    # record's "lazop" dict, e.g.
+    #   ts=2025-07-06T10:00:00 level=ERROR api=/orders/get code=IllegalAccessToken
+    #   request_id=0b86d3f2... latency_ms=412.3 app_key=... message="..."
+    #===========================================================================
+    def __init__(self, fmt = P_LOG_FORMAT_KV):
+        logging.Formatter.__init__(self)
+        self.fmt = fmt
+
+    def format(self, record):
+        fields = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)),
+                  "level": record.levelname}
+        fields.update(getattr(record, "lazop", None) or {"message": record.getMessage()})
+        if self.fmt == P_LOG_FORMAT_JSON:
+            return json.dumps(fields, ensure_ascii=False, default=str)
+        parts = []
+        for k, v in fields.items():
+            if v is None or v == "":
+                continue
+            v = v if isinstance(v, str) else str(v)
+            if not v or any(c in v for c in ' "='):
+                v = json.dumps(v, ensure_ascii=False)
+            parts.append("%s=%s" % (k, v))
+        return " ".join(parts)
+
+
+class LazopFloodFilter(logging.Filter):
+    #===========================================================================
+    # Error-flood sampling: per (api, code) and per one-second window, the first
+    # `burst` errors pass; beyond that each passes with probability `sample_rate`.
+    # The next record that passes carries suppressed=<n dropped since the last one>.
+    # Records below ERROR (INFO success lines) are never sampled.
+    #===========================================================================
+    def __init__(self, burst = 5, sample_rate = 0.01):
+        logging.Filter.__init__(self)
+        self.burst = max(0, int(burst))
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        self._lock = threading.Lock()
+        self._windows = {}  # (api, code) -> [window_start, seen, suppressed]
+
+    def filter(self, record):
+        if record.levelno < logging.ERROR:
+            return True
+        fields = getattr(record, "lazop", None) or {}
+        key = (fields.get("api"), fields.get("code"))
+        now = int(time.time())
+        with self._lock:
+            w = self._windows.get(key)
+            if w is None or w[0] != now:
+                suppressed = w[2] if w is not None else 0
+                if len(self._windows) > 1000:
+                    self._windows.clear()
+                w = self._windows[key] = [now, 0, suppressed]
+            w[1] += 1
+            if w[1] > self.burst and random.random() >= self.sample_rate:
+                w[2] += 1
+                return False
+            suppressed, w[2] = w[2], 0
+        if suppressed:
+            record.lazop = dict(fields, suppressed=suppressed)
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    #===========================================================================
+    # QueueHandler that never blocks or raises when the queue is full: the record
+    # is dropped and counted (reported as dropped=<n> on the next queued record).
+    # The record is enqueued as-is; formatting happens on the listener thread.
+    #===========================================================================
+    def __init__(self, q):
+        logging.handlers.QueueHandler.__init__(self, q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        if self.dropped:
+            record.lazop = dict(getattr(record, "lazop", None) or {}, dropped=self.dropped)
+        try:
+            self.queue.put_nowait(record)
+            self.dropped = 0
+        except queue.Full:
+            self.dropped += 1
+
+
+_log_lock = threading.RLock()
+_log_state = {"pid": None, "listener": None, "handler": None, "options": None}
+
+
+def configure_logging(log_dir = None, fmt = None, rotate = None, max_bytes = None,
+                      backups = None, flood_burst = None, sample_rate = None):
+    #===========================================================================
+    # (Re)build the logging pipeline. Arguments left as None fall back to the
+    # LAZOP_LOG_* environment variables. Safe to call more than once; the previous
+    # listener is flushed and stopped first.
+    #===========================================================================
+    options = {
+        "log_dir": log_dir or os.getenv("LAZOP_LOG_DIR") or os.path.join(expanduser("~"), "logs"),
+        "fmt": (fmt or os.getenv("LAZOP_LOG_FORMAT") or P_LOG_FORMAT_KV).lower(),
+        "rotate": (rotate or os.getenv("LAZOP_LOG_ROTATE") or P_LOG_ROTATE_SIZE).lower(),
+        "max_bytes": int(max_bytes if max_bytes is not None else _env_float("LAZOP_LOG_MAX_BYTES", 10 * 1024 * 1024)),
+        "backups": int(backups if backups is not None else _env_float("LAZOP_LOG_BACKUPS", 7)),
+        "flood_burst": flood_burst if flood_burst is not None else _env_float("LAZOP_LOG_FLOOD_BURST", 5),
+        "sample_rate": sample_rate if sample_rate is not None else _env_float("LAZOP_LOG_SAMPLE_RATE", 0.01),
+    }
+    with _log_lock:
+        _stop_logging_locked()
+        os.makedirs(options["log_dir"], exist_ok=True)
+        path = os.path.join(options["log_dir"], "lazopsdk.log")
+        if options["rotate"] == P_LOG_ROTATE_TIME:
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                path, when="midnight", backupCount=options["backups"], encoding="utf-8", delay=True)
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=options["max_bytes"], backupCount=options["backups"], encoding="utf-8", delay=True)
+        file_handler.setFormatter(LazopLogFormatter(options["fmt"]))
+
+        q = queue.Queue(P_LOG_QUEUE_SIZE)
+        handler = _DroppingQueueHandler(q)
+        handler.addFilter(LazopFloodFilter(options["flood_burst"], options["sample_rate"]))
+        listener = logging.handlers.QueueListener(q, file_handler)
+        listener.start()
+        logger.addHandler(handler)
+        _log_state.update(pid=os.getpid(), listener=listener, handler=handler, options=options)
+    return options
+
+
+def _stop_logging_locked():
+    handler, listener = _log_state["handler"], _log_state["listener"]
+    if handler is not None:
+        logger.removeHandler(handler)
+    # the listener thread does not survive a fork; only the owning process can join it
+    if listener is not None and _log_state["pid"] == os.getpid():
+        listener.stop()
+        for h in listener.handlers:
+            h.close()
+    _log_state.update(pid=None, listener=None, handler=None)
+
+
+def shutdown_logging():
+    # flush queued records to disk (registered atexit; also handy in tests)
+    with _log_lock:
+        _stop_logging_locked()
+
+
+def _ensure_logging():
+    # lazily started on first use, and restarted in a forked worker
+    if _log_state["pid"] == os.getpid():
+        return
+    with _log_lock:
+        if _log_state["pid"] == os.getpid():
+            return
+        try:
+            configure_logging(**(_log_state["options"] or {}))
+        except OSError:
+            # unwritable log dir: keep serving, logging is best effort
+            _log_state["pid"] = os.getpid()
+
+
+atexit.register(shutdown_logging)
+
+_host_info = {}
+
+
+def _host():
+    # resolved once: gethostbyname can block on DNS and must not run per error
+    if not _host_info:
+        try:
+            ip = socket.gethostbyname(socket.gethostname())
+        except OSError:
+            ip = ""
+        _host_info.update(ip=ip, platform=platform.platform())
+    return _host_info
+
+
+def _redact(url):
+    if "?" not in url:
+        return url
+    base, query = url.split("?", 1)
+    kept = [p for p in query.split("&") if p.split("=", 1)[0] not in P_LOG_REDACTED]
+    return base + ("?" + "&".join(kept) if kept else "")
+
+
+def logApiError(appkey, sdkVersion, requestUrl, code, message, api = None, request_id = None,
+                latency = None, level = logging.ERROR):
+    _ensure_logging()
+    host = _host()
+    logger.log(level, message, extra={"lazop": {
+        "api": api,
+        "code": code,
+        "message": message,
+        "request_id": request_id,
+        "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+        "app_key": appkey,
+        "sdk": sdkVersion,
+        "ip": host["ip"],
+        "platform": host["platform"],
+        "url": _redact(str(requestUrl)),
+    }})
 
 class LazopRequest(object):
     def __init__(self,api_pame,http_method = 'POST'):
@@ -121,17 +346,98 @@ class LazopResponse(object):
             " requestId=" + mixStr(self.request_id)
         return sb
 
+class LazopJournal(object):
+    #===========================================================================
+    # Append-only JSONL journal of API calls, one line per call:
+    #   {"api": "/orders/get", "params": {...}, "body": {...}, "recorded_at": ...}
+    # params are the application parameters minus sign/timestamp/access_token.
+    # Replay serves the most recently recorded body for the same api + params;
+    # only replay keeps the index in memory, record mode just appends to the file.
+    #===========================================================================
+    def __init__(self, path, mode = P_JOURNAL_RECORD):
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._index = {}
+        if mode == P_JOURNAL_REPLAY:
+            self._load()
+
+    @staticmethod
+    def key(api, parameters):
+        clean = dict((k, mixStr(v)) for k, v in parameters.items() if k not in P_JOURNAL_EXCLUDED)
+        return api + "?" + json.dumps(clean, sort_keys=True)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # a torn last line from an interrupted recording; skip it
+                    continue
+                self._index[self.key(entry["api"], entry.get("params") or {})] = entry["body"]
+
+    def __len__(self):
+        return len(self._index)
+
+    def lookup(self, api, parameters):
+        return self._index.get(self.key(api, parameters))
+
+    def append(self, api, parameters, body):
+        clean = dict((k, mixStr(v)) for k, v in parameters.items() if k not in P_JOURNAL_EXCLUDED)
+        line = json.dumps({"api": api, "params": clean, "body": body,
+                           "recorded_at": int(time.time())}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            if self.mode == P_JOURNAL_REPLAY:
+                self._index[self.key(api, parameters)] = body
+
+
 class LazopClient(object):
     
     log_level = P_LOG_LEVEL_ERROR
-    def __init__(self, server_url,app_key,app_secret,timeout=30):
+    def __init__(self, server_url,app_key,app_secret,timeout=30,journal=None):
         self._server_url = server_url
         self._app_key = app_key
         self._app_secret = app_secret
         self._timeout = timeout
+        self._journal = journal
+
+    def _replay(self, request):
+        jsonobj = self._journal.lookup(request._api_pame, request._api_params)
+        if jsonobj is None:
+            jsonobj = {P_CODE: "ReplayMiss", P_TYPE: "ISP",
+                       P_MESSAGE: "no journal entry for " + request._api_pame}
+            logApiError(self._app_key, P_SDK_VERSION, request._api_pame, jsonobj[P_CODE], jsonobj[P_MESSAGE],
+                        api=request._api_pame)
+        return self._to_response(jsonobj)
+
+    def _to_response(self, jsonobj):
+        response = LazopResponse()
+
+        if P_CODE in jsonobj:
+            response.code = jsonobj[P_CODE]
+        if P_TYPE in jsonobj:
+            response.type = jsonobj[P_TYPE]
+        if P_MESSAGE in jsonobj:
+            response.message = jsonobj[P_MESSAGE]
+        if P_REQUEST_ID in jsonobj:
+            response.request_id = jsonobj[P_REQUEST_ID]
+
+        response.body = jsonobj
+        return response
     
     def execute(self, request,access_token = None):
 
+        if self._journal is not None and self._journal.mode == P_JOURNAL_REPLAY:
+            return self._replay(request)
+
         sys_parameters = {
             P_APPKEY: self._app_key,
             P_SIGN_METHOD: "sha256",
@@ -159,34 +465,33 @@ class LazopClient(object):
             full_url += key + "=" + str(sign_parameter[key]) + "&";
         full_url = full_url[0:-1]
 
+        started = time.perf_counter()
         try:
             if(request._http_method == 'POST' or len(request._file_params) != 0) :
                 r = requests.post(api_url,sign_parameter,files=request._file_params, timeout=self._timeout)
             else:
                 r = requests.get(api_url,sign_parameter, timeout=self._timeout)
         except Exception as err:
-            logApiError(self._app_key, P_SDK_VERSION, full_url, "HTTP_ERROR", str(err))
+            logApiError(self._app_key, P_SDK_VERSION, full_url, "HTTP_ERROR", str(err),
+                        api=request._api_pame, latency=time.perf_counter() - started)
             raise err
-
-        response = LazopResponse()
+        latency = time.perf_counter() - started
 
         jsonobj = r.json()
 
-        if P_CODE in jsonobj:
-            response.code = jsonobj[P_CODE]
-        if P_TYPE in jsonobj:
-            response.type = jsonobj[P_TYPE]
-        if P_MESSAGE in jsonobj:
-            response.message = jsonobj[P_MESSAGE]
-        if P_REQUEST_ID in jsonobj:
-            response.request_id = jsonobj[P_REQUEST_ID]
+        response = self._to_response(jsonobj)
+
+        # only successful calls are journaled, so a replay never re-serves throttling/errors
+        if self._journal is not None and self._journal.mode == P_JOURNAL_RECORD \
+                and (response.code is None or response.code == "0"):
+            self._journal.append(request._api_pame, application_parameter, jsonobj)
 
         if response.code is not None and response.code != "0":
-            logApiError(self._app_key, P_SDK_VERSION, full_url, response.code, response.message)
+            logApiError(self._app_key, P_SDK_VERSION, full_url, response.code, response.message,
+                        api=request._api_pame, request_id=response.request_id, latency=latency)
         else:
             if(self.log_level == P_LOG_LEVEL_DEBUG or self.log_level == P_LOG_LEVEL_INFO):
-                logApiError(self._app_key, P_SDK_VERSION, full_url, "", "")
-
-        response.body = jsonobj
+                logApiError(self._app_key, P_SDK_VERSION, full_url, "", "", api=request._api_pame,
+                            request_id=response.request_id, latency=latency, level=logging.INFO)
 
         return response
@@ -1,9 +1,26 @@
 import os
+import base64
+import csv
+import hashlib
+import hmac
+import io
+import itertools
+import json
+import queue
+import threading
 import time
 from datetime import datetime, timedelta, date
 from decimal import Decimal, ROUND_HALF_UP
-from flask import Flask, render_template, request, jsonify
-from lazop import LazopClient, LazopRequest
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, send_file, redirect
+from jinja2.utils import htmlsafe_json_dumps
+from markupsafe import Markup
+from lazop import LazopClient, LazopRequest, LazopJournal
+import metrics
+import settlements
+from fragments import FragmentCache, ROW_HTML, ROW_JSON
+from search import OrderSearchIndex
+from statuses import FLAG_RETURNED, classify, display_label, order_flags, unknown_titles
+from thumbnails import ThumbnailStore, fetcher_from_spec
 
 # Import the correct database connector
 try:
@@ -18,9 +35,16 @@ APP_KEY = os.getenv("DARAZ_APP_KEY")
 APP_SECRET = os.getenv("DARAZ_APP_SECRET")
 ACCESS_TOKEN = os.getenv("DARAZ_ACCESS_TOKEN")
 
+# Record/replay of Daraz API calls: "off" (default), "record" or "replay"
+# replay serves every call from the journal with no network (dev/staging/benchmarks)
+LAZOP_JOURNAL_MODE = (os.getenv("LAZOP_JOURNAL_MODE") or "off").strip().lower()
+LAZOP_JOURNAL_PATH = os.getenv("LAZOP_JOURNAL_PATH", "lazop_journal.jsonl")
+
 # ---- DATABASE CONFIG ----
 COSTS_TABLE = "tqm_product_costs"
 VENDOR_PAYMENTS_TABLE = "vendor_payments"  # Using the table created in vendor_payments.sql
+DATA_VERSION_TABLE = "tqm_data_version"  # change feed, see sql/tqm_data_version.sql
+FINANCE_TX_TABLE = "tqm_finance_transactions"  # see sql/tqm_finance_transactions.sql
 
 # Hardcoded initial fetch date: 6 July 2025 (+05:00)
 CREATED_AFTER_ISO = "2025-07-06T00:00:00+05:00"
@@ -34,7 +58,50 @@ STATUSES_EXCEPT_CANCELED = [
 
 VENDOR_CHOICES = ["Tick Bags", "Sleek Space", "Other"]
 
+# Push updates: bursts for the same order within this window collapse into one refresh
+PUSH_COALESCE_SECONDS = float(os.getenv("DARAZ_PUSH_COALESCE_SECONDS", "2"))
+# Slow polling safety net behind the webhook (0 disables); default every 6 hours
+SAFETY_POLL_SECONDS = int(os.getenv("DARAZ_SAFETY_POLL_SECONDS", "21600"))
+
+# How often each instance checks tqm_data_version for cost/payment writes made by
+# other instances (0 disables; local writes are always applied immediately)
+DB_CHANGE_POLL_SECONDS = float(os.getenv("TQM_DB_POLL_SECONDS", "5"))
+# Startup DB check: retry backoff bounds while the database is unreachable
+DB_RETRY_MIN_SECONDS = 5
+DB_RETRY_MAX_SECONDS = 300
+
+# /orders/get page size (Daraz allows at most 100)
+ORDERS_PAGE_LIMIT = 100
+
+# Payment history paging (/api/get_payments)
+PAYMENTS_PAGE_DEFAULT = 50
+PAYMENTS_PAGE_MAX = 500
+
+# /api/search
+SEARCH_LIMIT_DEFAULT = 20
+SEARCH_LIMIT_MAX = 200
+
+# Product image thumbnails (/img/<hash>): disk cache location, size cap and edge length (px)
+THUMB_DIR = os.getenv("TQM_THUMB_DIR", "thumbs")
+THUMB_MAX_MB = float(os.getenv("TQM_THUMB_MAX_MB", "256"))
+THUMB_SIZE = int(os.getenv("TQM_THUMB_SIZE", "160"))
+THUMB_MAX_AGE = 365 * 24 * 3600
+
+# Rendered stats cards kept between requests (LRU, entries). Rows are cached one slot
+# per order and need no limit (see fragments.py).
+FRAGMENT_CACHE_SIZE = int(os.getenv("TQM_FRAGMENT_CACHE_SIZE", "1000"))
+
+# Settlement ingest (/api/settlements): days per finance API query window, rows per page
+FINANCE_WINDOW_DAYS = int(os.getenv("TQM_FINANCE_WINDOW_DAYS", "7"))
+FINANCE_PAGE_LIMIT = 500
+
+# SQL Server caps a statement at 2100 parameters; 4 per cost row keeps us well under it.
+COSTS_MERGE_CHUNK = 500
+# 10 parameters per finance transaction row
+FINANCE_MERGE_CHUNK = 200
+
 app = Flask(__name__)
+metrics.init_app(app)
 
 
 @app.template_filter('first_words')
@@ -48,7 +115,124 @@ def first_words(s, n=3):
     return trimmed + ("…" if len(parts) > n else "")
 
 
-client = LazopClient(ENDPOINT, APP_KEY, APP_SECRET)
+class _InstrumentedLazopClient(LazopClient):
+    """LazopClient that records per-API latency and per-request call counts."""
+    account_name = "default"
+
+    def execute(self, request, access_token=None):
+        with metrics.timed_call("tqm_lazop_execute_seconds", "api_calls",
+                                {"api": request._api_pame, "account": self.account_name},
+                                "LazopClient.execute latency per Daraz API path"):
+            return super().execute(request, access_token)
+
+
+class _RateLimiter(object):
+    """Token bucket: at most `rate` calls/second with bursts up to `burst`. rate <= 0 disables."""
+
+    def __init__(self, rate: float, burst: int = 5):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class DarazAccount(object):
+    """
+    One Daraz seller storefront: its own client (and journal), access token, rate budget
+    and sync schedule. Orders from every account share RAW_ORDERS_CACHE, tagged with
+    entry["account"], so the dashboard is merged and filterable per account.
+    """
+
+    def __init__(self, name: str, access_token: str, app_key: str = None, app_secret: str = None,
+                 endpoint: str = None, seller_id: str = None, rate: float = 0, burst: int = 5,
+                 poll_seconds: int = None):
+        self.name = name
+        self.access_token = access_token
+        self.app_key = app_key or APP_KEY
+        self.app_secret = app_secret or APP_SECRET
+        self.endpoint = endpoint or ENDPOINT
+        self.seller_id = str(seller_id) if seller_id else None
+        self.poll_seconds = SAFETY_POLL_SECONDS if poll_seconds is None else int(poll_seconds)
+        self.limiter = _RateLimiter(rate, burst)
+        self.client = _InstrumentedLazopClient(self.endpoint, self.app_key, self.app_secret,
+                                               journal=_journal_for(name))
+        self.client.account_name = name
+
+    def execute(self, req):
+        """Run one API call within this account's rate budget."""
+        self.limiter.acquire()
+        return self.client.execute(req)
+
+
+def _journal_for(account_name: str):
+    if LAZOP_JOURNAL_MODE not in ("record", "replay"):
+        return None
+    # journal entries are matched without the access token, so each account needs its own file
+    path = LAZOP_JOURNAL_PATH
+    if account_name != "default":
+        root, ext = os.path.splitext(path)
+        path = f"{root}.{account_name}{ext or '.jsonl'}"
+    j = LazopJournal(path, LAZOP_JOURNAL_MODE)
+    print(f"[lazop] journal {LAZOP_JOURNAL_MODE}: {path}"
+          + (f" ({len(j)} entries)" if LAZOP_JOURNAL_MODE == "replay" else ""))
+    return j
+
+
+def _load_accounts() -> dict[str, DarazAccount]:
+    """
+    DARAZ_ACCOUNTS (JSON) or DARAZ_ACCOUNTS_FILE (path to the same JSON), e.g.
+      [{"name": "tickbags", "access_token": "...", "seller_id": "1001", "rate": 5, "poll_seconds": 3600},
+       {"name": "sleekspace", "access_token": "...", "app_key": "...", "app_secret": "..."}]
+    Missing app_key/app_secret/endpoint fall back to DARAZ_APP_KEY/DARAZ_APP_SECRET/DARAZ_ENDPOINT.
+    Without either variable, a single "default" account is built from DARAZ_ACCESS_TOKEN.
+    """
+    raw = os.getenv("DARAZ_ACCOUNTS")
+    path = os.getenv("DARAZ_ACCOUNTS_FILE")
+    if not raw and path:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = f.read()
+    if not raw:
+        return {"default": DarazAccount("default", ACCESS_TOKEN)}
+
+    accounts = {}
+    for cfg in json.loads(raw):
+        name = str(cfg.get("name") or "").strip()
+        if not name or name in accounts:
+            raise ValueError(f"DARAZ_ACCOUNTS: missing or duplicate account name {name!r}")
+        accounts[name] = DarazAccount(
+            name, cfg.get("access_token"), cfg.get("app_key"), cfg.get("app_secret"), cfg.get("endpoint"),
+            cfg.get("seller_id"), float(cfg.get("rate") or 0), int(cfg.get("burst") or 5), cfg.get("poll_seconds"),
+        )
+    return accounts
+
+
+ACCOUNTS = _load_accounts()
+DEFAULT_ACCOUNT = next(iter(ACCOUNTS.values()))
+client = DEFAULT_ACCOUNT.client
+
+
+def _account(name: str | None) -> DarazAccount:
+    return ACCOUNTS.get(name or "") or DEFAULT_ACCOUNT
+
+
+@app.context_processor
+def _inject_accounts():
+    return {"accounts": list(ACCOUNTS)}
 
 
 # ---------- helpers ----------
@@ -112,6 +296,12 @@ def _item_key(it: dict) -> str:
 
 def get_db_connection(retries=10, delay=5):
     """Connect to MSSQL with retry logic."""
+    with metrics.timed_call("tqm_db_connect_seconds", "db_calls", None,
+                            "get_db_connection latency (including retries)"):
+        return _connect_with_retry(retries, delay)
+
+
+def _connect_with_retry(retries, delay):
     server = os.getenv('DB_SERVER')
     database = os.getenv('DB_DATABASE')
     username = os.getenv('DB_USERNAME')
@@ -129,7 +319,6 @@ def get_db_connection(retries=10, delay=5):
                 timeout=10,
                 login_timeout=10
             )
-            print("Database connected")
             return connection
 
         except pymssql.Error as e:
@@ -169,76 +358,138 @@ def check_database_connection():
 
 # --- DATABASE I/O FUNCTIONS (Existing/Modified) ---
 
-def _load_db_costs() -> dict:
-    """Loads all product costs from the tqm_product_costs table."""
-    costs = {}
-    sql = f"SELECT item_key, product_cost, packaging, vendor FROM {COSTS_TABLE};"
-    try:
-        with get_db_connection() as conn:
-            if not conn: return {}
+# item_key -> {"product_cost", "packaging", "vendor"}; mirrors tqm_product_costs
+COSTS_CACHE: dict[str, dict] = {}
+# item_key -> version of its COSTS_CACHE value (bumped only when the value changes).
+# Versions come from _versions, shared with cached orders, so they only ever grow.
+COSTS_VERSION: dict[str, int] = {}
+_versions = itertools.count(1)
 
-            cursor = conn.cursor()
-            cursor.execute(sql)
-            for row in cursor.fetchall():
-                key = row[0]
-                # Convert DECIMAL results to string for consistency
-                costs[key] = {
-                    "product_cost": str(row[1]),
-                    "packaging": str(row[2]),
-                    "vendor": row[3]
-                }
-    except Exception as e:
-        print(f"[DB ERROR] Failed to load costs: {e}")
-    return costs
+
+def _apply_costs_to_cache(rows: list[dict]) -> list[str]:
+    """
+    Apply cost rows ({"key", "product_cost", "packaging", "vendor"}) to COSTS_CACHE.
+    Returns the keys whose value actually changed (their COSTS_VERSION is bumped).
+    """
+    changed = []
+    for r in rows:
+        # same 2dp form the DECIMAL(12,2) columns return, so a local save and the
+        # change feed echoing it back compare equal
+        value = {
+            "product_cost": str(_d(r["product_cost"]).quantize(Decimal("0.01"))),
+            "packaging": str(_d(r["packaging"]).quantize(Decimal("0.01"))),
+            "vendor": r["vendor"],
+        }
+        if COSTS_CACHE.get(r["key"]) != value:
+            COSTS_CACHE[r["key"]] = value
+            COSTS_VERSION[r["key"]] = next(_versions)
+            changed.append(r["key"])
+    return changed
+
+
+def _costs_snapshot() -> dict:
+    """
+    COSTS_CACHE, loaded from the database on first use (kept current by _sync_db_changes).
+    Until the startup check has reached the database (first attempt still running, or
+    retrying an unreachable DB), requests do not connect on their own; they see the
+    (empty) cache until _db_connect_loop loads it.
+    """
+    if DB_SYNC["version"] is None and HYDRATION["db_ok"] is True:
+        _sync_db_changes()
+    return COSTS_CACHE
+
+
+def _next_data_version(cursor) -> int:
+    """
+    Bump tqm_data_version inside the caller's transaction and return the new version.
+    The row lock is held until commit, so writers commit in version order.
+    """
+    cursor.execute(f"UPDATE {DATA_VERSION_TABLE} SET version = version + 1 WHERE id = 1;")
+    cursor.execute(f"SELECT version FROM {DATA_VERSION_TABLE} WHERE id = 1;")
+    return int(cursor.fetchone()[0])
 
 
 def _save_db_cost(key: str, pc: str, pk: str, vendor: str):
     """Saves/Updates a single product cost record (UPSERT logic)."""
-    # Note: pymssql uses %s placeholders
-    sql_update = f"""
-        UPDATE {COSTS_TABLE} 
-        SET product_cost = %s, packaging = %s, vendor = %s 
-        WHERE item_key = %s;
+    return _save_db_costs_bulk([{"key": key, "product_cost": pc, "packaging": pk, "vendor": vendor}])
+
+
+def _save_db_costs_bulk(rows: list[dict]) -> bool:
     """
-    sql_insert = f"""
-        INSERT INTO {COSTS_TABLE} (item_key, product_cost, packaging, vendor) 
-        VALUES (%s, %s, %s, %s);
+    Upserts many product cost records in ONE transaction.
+    Each row: {"key", "product_cost", "packaging", "vendor"} (already validated).
+    Uses a set-based MERGE per chunk instead of UPDATE-then-INSERT per row. The rows are
+    stamped with a new tqm_data_version so other instances pick them up.
     """
+    if not rows:
+        return True
     try:
         with get_db_connection() as conn:
             if not conn: return False
 
             cursor = conn.cursor()
-
-            # 1. Try to UPDATE (pc and pk are passed as strings/Decimals, pymssql handles type)
-            cursor.execute(sql_update, (pc, pk, vendor, key))
-
-            # 2. If no rows were updated, INSERT
-            if cursor.rowcount == 0:
-                cursor.execute(sql_insert, (key, pc, pk, vendor))
+            version = _next_data_version(cursor)
+            for i in range(0, len(rows), COSTS_MERGE_CHUNK):
+                chunk = rows[i:i + COSTS_MERGE_CHUNK]
+                values_sql = ", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))
+                params = []
+                for r in chunk:
+                    params.extend([r["key"], r["product_cost"], r["packaging"], r["vendor"], version])
+                # Note: pymssql uses %s placeholders
+                cursor.execute(f"""
+                    MERGE {COSTS_TABLE} WITH (HOLDLOCK) AS t
+                    USING (VALUES {values_sql}) AS s (item_key, product_cost, packaging, vendor, version)
+                    ON t.item_key = s.item_key
+                    WHEN MATCHED THEN
+                        UPDATE SET product_cost = s.product_cost, packaging = s.packaging, vendor = s.vendor,
+                                   version = s.version
+                    WHEN NOT MATCHED THEN
+                        INSERT (item_key, product_cost, packaging, vendor, version)
+                        VALUES (s.item_key, s.product_cost, s.packaging, s.vendor, s.version);
+                """, tuple(params))
 
             conn.commit()
             return True
     except Exception as e:
-        print(f"[DB ERROR] Failed to save cost for {key}: {e}")
+        print(f"[DB ERROR] Failed to save {len(rows)} cost(s): {e}")
         return False
 
 
 # --- VENDOR PAYMENT DATABASE FUNCTIONS ---
 
 def _save_db_payment(vendor: str, amount: Decimal, payment_date: str, user_id: str):
-    """Inserts a new payment record into the vendor_payments table."""
+    """
+    Inserts a new payment record into the vendor_payments table, with the vendor's
+    running balance (total paid including this payment) stored on the row so the
+    paged history never has to re-sum the vendor's past payments.
+    """
+    sql_last_balance = f"""
+        SELECT TOP (1) balance FROM {VENDOR_PAYMENTS_TABLE}
+        WHERE user_id = %s AND vendor = %s
+        ORDER BY [timestamp] DESC, id DESC;
+    """
     sql_insert = f"""
-        INSERT INTO {VENDOR_PAYMENTS_TABLE} (user_id, vendor, amount, payment_date)
-        VALUES (%s, %s, %s, %s);
+        INSERT INTO {VENDOR_PAYMENTS_TABLE} (user_id, vendor, amount, payment_date, balance, version)
+        VALUES (%s, %s, %s, %s, %s, %s);
     """
     try:
         with get_db_connection() as conn:
             if not conn: return False
 
             cursor = conn.cursor()
+            # Bumping the version first also serializes payment writers (the version row
+            # stays locked until commit), so the previous row's balance cannot go stale.
+            version = _next_data_version(cursor)
+            cursor.execute(sql_last_balance, (user_id, vendor))
+            row = cursor.fetchone()
+            if row is not None and row[0] is None:
+                # rows written before the balance column was backfilled
+                cursor.execute(f"SELECT SUM(amount) FROM {VENDOR_PAYMENTS_TABLE} WHERE user_id = %s AND vendor = %s;",
+                               (user_id, vendor))
+                row = cursor.fetchone()
+            balance = (_d(row[0]) if row is not None and row[0] is not None else Decimal("0")) + _d(amount)
             # Note: payment_date is YYYY-MM-DD string, amount is Decimal/string
-            cursor.execute(sql_insert, (user_id, vendor, amount, payment_date))
+            cursor.execute(sql_insert, (user_id, vendor, amount, payment_date, balance, version))
             conn.commit()
             return True
     except Exception as e:
@@ -246,34 +497,81 @@ def _save_db_payment(vendor: str, amount: Decimal, payment_date: str, user_id: s
         return False
 
 
-def _load_db_vendor_payments(user_id: str) -> list[dict]:
-    """Loads all vendor payment records for history, sorted by timestamp (most recent first)."""
-    # Note: We include user_id in the WHERE clause per best practice, though it's
-    # part of the security model/context.
+def _encode_payment_cursor(ts: datetime, payment_id) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{payment_id}".encode()).decode()
+
+
+def _decode_payment_cursor(cursor: str | None) -> tuple[datetime, int] | None:
+    """Returns (timestamp, id) or None. Raises ValueError on a malformed cursor."""
+    if not cursor:
+        return None
+    ts_str, id_str = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    return datetime.fromisoformat(ts_str), int(id_str)
+
+
+def _load_db_vendor_payments(user_id: str, limit: int = PAYMENTS_PAGE_DEFAULT, cursor: str | None = None,
+                             vendor: str | None = None, date_from: str | None = None,
+                             date_to: str | None = None) -> tuple[list[dict], str | None]:
+    """
+    Loads one page of vendor payment history, most recent first.
+    Keyset pagination on (timestamp, id) DESC - pass the returned next_cursor to get the
+    following page. "balance" is the vendor's running total paid up to and including that
+    payment (over ALL of the vendor's payments, not just the filtered range); it is stored
+    on each row by _save_db_payment, so a page reads only its own rows.
+    See sql/vendor_payments_indexes.sql for the balance column and supporting indexes.
+    Returns: (history, next_cursor or None when there are no more rows)
+    """
+    limit = max(1, min(int(limit), PAYMENTS_PAGE_MAX))
+    after = _decode_payment_cursor(cursor)
+
+    where = ["user_id = %s"]
+    params = [user_id]
+    if vendor:
+        where.append("vendor = %s")
+        params.append(vendor)
+    if date_from:
+        where.append("payment_date >= %s")
+        params.append(date_from)
+    if date_to:
+        where.append("payment_date <= %s")
+        params.append(date_to)
+    if after:
+        where.append("([timestamp] < %s OR ([timestamp] = %s AND id < %s))")
+        params.extend([after[0], after[0], after[1]])
+
+    # Fetch one extra row to know whether another page exists
     sql = f"""
-        SELECT payment_date, vendor, amount
+        SELECT TOP ({limit + 1}) id, [timestamp], payment_date, vendor, amount, balance
         FROM {VENDOR_PAYMENTS_TABLE}
-        WHERE user_id = %s
-        ORDER BY timestamp DESC;
+        WHERE {" AND ".join(where)}
+        ORDER BY [timestamp] DESC, id DESC;
     """
     history = []
+    next_cursor = None
     try:
         with get_db_connection() as conn:
-            if not conn: return []
-
-            cursor = conn.cursor()
-            cursor.execute(sql, (user_id,))
-            for row in cursor.fetchall():
-                # row[0] is DATE object, row[2] is DECIMAL
+            if not conn: return [], None
+
+            db_cursor = conn.cursor()
+            db_cursor.execute(sql, tuple(params))
+            rows = db_cursor.fetchall()
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = _encode_payment_cursor(rows[-1][1], rows[-1][0])
+            for row in rows:
+                # row[2] is DATE object, row[4]/row[5] are DECIMAL
                 history.append({
-                    "date": row[0].strftime("%Y-%m-%d"),
-                    "vendor": row[1],
-                    "amount": str(row[2]),
-                    "amount_fmt": _fmt_pkr(row[2])
+                    "id": row[0],
+                    "date": row[2].strftime("%Y-%m-%d"),
+                    "vendor": row[3],
+                    "amount": str(row[4]),
+                    "amount_fmt": _fmt_pkr(row[4]),
+                    "balance": str(row[5]),
+                    "balance_fmt": _fmt_pkr(row[5]),
                 })
     except Exception as e:
         print(f"[DB ERROR] Failed to load payment history: {e}")
-    return history
+    return history, next_cursor
 
 
 def _load_db_payments_total() -> dict[str, Decimal]:
@@ -311,66 +609,351 @@ def _load_db_payments_total() -> dict[str, Decimal]:
     return totals
 
 
+# --- CROSS-INSTANCE SYNC (tqm_data_version change feed) ---
+# "version": last tqm_data_version applied to COSTS_CACHE / "payments" (None = not loaded yet)
+# "payments": vendor -> total paid, maintained incrementally
+DB_SYNC = {"version": None, "payments": None, "synced_at": None}
+_db_sync_lock = threading.Lock()
+_db_poll_thread = None
+
+
+def _sync_db_changes(conn=None) -> bool:
+    """
+    Bring COSTS_CACHE and the payment totals up to the current tqm_data_version.
+    The first call loads everything; later calls fetch only cost rows and payments
+    stamped after the last applied version (usually none: one single-row read).
+    Changes are pushed to live dashboards. Returns False if the database is unreachable.
+    conn: a connection the caller keeps open (the change poll); otherwise one connect
+    attempt is made, before taking the lock, so callers never wait on retries.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection(retries=1, delay=0)
+        if not conn:
+            return False
+    try:
+        return _sync_db_changes_on(conn)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _sync_db_changes_on(conn) -> bool:
+    with _db_sync_lock:
+        since = DB_SYNC["version"]
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT version FROM {DATA_VERSION_TABLE} WHERE id = 1;")
+            current = int(cursor.fetchone()[0])
+            cost_rows, payment_rows = [], []
+            if since is None or current > since:
+                if since is None:
+                    where, params = "version <= %s", (current,)
+                else:
+                    where, params = "version > %s AND version <= %s", (since, current)
+
+                cursor.execute(f"""
+                    SELECT item_key, product_cost, packaging, vendor
+                    FROM {COSTS_TABLE} WHERE {where};
+                """, params)
+                cost_rows = [{"key": r[0], "product_cost": r[1], "packaging": r[2], "vendor": r[3]}
+                             for r in cursor.fetchall()]
+
+                # Payments are insert-only, so new rows just add to the running totals
+                cursor.execute(f"""
+                    SELECT vendor, amount, payment_date
+                    FROM {VENDOR_PAYMENTS_TABLE} WHERE {where};
+                """, params)
+                payment_rows = cursor.fetchall()
+            # end the read transaction so a kept connection sees later commits
+            conn.commit()
+        except Exception as e:
+            print(f"[DB ERROR] Failed to sync costs/payments (version {since}): {e}")
+            return False
+
+        if since is not None and current <= since:
+            DB_SYNC["synced_at"] = time.time()
+            return True
+
+        changed_keys = _apply_costs_to_cache(cost_rows)
+        totals = dict(DB_SYNC["payments"] or {v: Decimal("0") for v in VENDOR_CHOICES})
+        for vendor, amount, _ in payment_rows:
+            vendor = vendor if vendor in VENDOR_CHOICES else "Other"
+            totals[vendor] = totals.get(vendor, Decimal("0")) + _d(amount)
+        DB_SYNC.update(version=current, payments=totals, synced_at=time.time())
+
+    if since is not None:
+        if changed_keys:
+            _notify_costs_changed(changed_keys, publish_stats=False)
+        for vendor, amount, payment_date in payment_rows:
+            _publish("payment", {"vendor": vendor, "amount": str(amount), "amount_fmt": _fmt_pkr(amount),
+                                 "date": str(payment_date)})
+        if changed_keys or payment_rows:
+            # one stats push per sync, with every change applied
+            _publish_stats()
+    return True
+
+
+def _payments_total() -> dict[str, Decimal]:
+    """Per-vendor payment totals from the synced state (queries the DB only if it was never loaded)."""
+    if DB_SYNC["payments"] is None:
+        if HYDRATION["db_ok"] is not True:
+            # DB not confirmed up yet: the background check loads it (see _costs_snapshot)
+            return {v: Decimal("0") for v in VENDOR_CHOICES}
+        if not _sync_db_changes():
+            return _load_db_payments_total()
+    return dict(DB_SYNC["payments"])
+
+
+def _db_poll_loop():
+    """Poll the change feed over one kept connection; reconnect (one attempt) after a failure."""
+    conn = None
+    while True:
+        time.sleep(DB_CHANGE_POLL_SECONDS)
+        if conn is None:
+            conn = get_db_connection(retries=1, delay=0)
+            if conn is None:
+                continue
+        if not _sync_db_changes(conn):
+            try:
+                conn.close()
+            except Exception:
+                pass
+            conn = None
+
+
+def _ensure_db_poll_started():
+    global _db_poll_thread
+    if DB_CHANGE_POLL_SECONDS <= 0 or (_db_poll_thread and _db_poll_thread.is_alive()):
+        return
+    _db_poll_thread = threading.Thread(target=_db_poll_loop, name="tqm-db-poll", daemon=True)
+    _db_poll_thread.start()
+
+
 # --- END VENDOR PAYMENT DATABASE FUNCTIONS ---
 
 
+# --- SETTLEMENT DATABASE FUNCTIONS (tqm_finance_transactions) ---
+
+def _save_db_finance_rows(rows: list[dict]) -> bool:
+    """Upserts normalized finance transactions (see settlements.normalize) in one transaction."""
+    if not rows:
+        return True
+    # Daraz can repeat a transaction within a page; MERGE rejects a source that matches
+    # one target row twice, so keep the last copy of each tx_key
+    rows = list({r["tx_key"]: r for r in rows}.values())
+    cols = ("tx_key", "account", "statement", "trade_order_id", "order_item_id", "transaction_date",
+            "transaction_type", "fee_name", "amount", "paid")
+    try:
+        with get_db_connection() as conn:
+            if not conn: return False
+
+            cursor = conn.cursor()
+            for i in range(0, len(rows), FINANCE_MERGE_CHUNK):
+                chunk = rows[i:i + FINANCE_MERGE_CHUNK]
+                values_sql = ", ".join(["(" + ", ".join(["%s"] * len(cols)) + ")"] * len(chunk))
+                params = []
+                for r in chunk:
+                    params.extend(r[c] for c in cols)
+                cursor.execute(f"""
+                    MERGE {FINANCE_TX_TABLE} WITH (HOLDLOCK) AS t
+                    USING (VALUES {values_sql}) AS s ({", ".join(cols)})
+                    ON t.tx_key = s.tx_key
+                    WHEN MATCHED THEN
+                        UPDATE SET {", ".join(f"{c} = s.{c}" for c in cols[1:])}
+                    WHEN NOT MATCHED THEN
+                        INSERT ({", ".join(cols)})
+                        VALUES ({", ".join(f"s.{c}" for c in cols)});
+                """, tuple(params))
+
+            conn.commit()
+            return True
+    except Exception as e:
+        print(f"[DB ERROR] Failed to save {len(rows)} finance transaction(s): {e}")
+        return False
+
+
+def _load_db_settlement_rows(account: str | None = None, statement: str | None = None,
+                             date_from: str | None = None, date_to: str | None = None) -> list[tuple] | None:
+    """
+    Per (account, statement, trade_order_id): payout, first/last transaction date,
+    unpaid row count, row count and whether this statement owns the order's vendor
+    liability (see below). With a date range, returns every row of each statement that
+    has at least one transaction in the range (statements are never cut).
+    Returns None if the database is unreachable.
+
+    An order can appear in several statements (sale, later refunds or adjustments). Its
+    liability belongs to exactly one of them, chosen across all stored statements (not
+    only those returned): the one holding its PRICE_FEE_NAME row, else the earliest.
+    """
+    where, params = [], []
+    if account:
+        where.append("t.account = %s")
+        params.append(account)
+    if statement is not None:
+        where.append("t.statement = %s")
+        params.append(statement)
+    if date_from or date_to:
+        inner = ["r.account = t.account", "r.statement = t.statement"]
+        if date_from:
+            inner.append("r.transaction_date >= %s")
+            params.append(date_from)
+        if date_to:
+            inner.append("r.transaction_date <= %s")
+            params.append(date_to)
+        where.append(f"EXISTS (SELECT 1 FROM {FINANCE_TX_TABLE} r WHERE {' AND '.join(inner)})")
+
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+    sql = f"""
+        WITH owner AS (
+            SELECT o.account, o.trade_order_id, o.statement,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY o.account, o.trade_order_id
+                       ORDER BY MAX(CASE WHEN o.fee_name = %s THEN 1 ELSE 0 END) DESC,
+                                CASE WHEN MIN(o.transaction_date) IS NULL THEN 1 ELSE 0 END,
+                                MIN(o.transaction_date), o.statement
+                   ) AS rn
+            FROM {FINANCE_TX_TABLE} o
+            WHERE o.trade_order_id IN (SELECT t.trade_order_id FROM {FINANCE_TX_TABLE} t {where_sql})
+            GROUP BY o.account, o.trade_order_id, o.statement
+        )
+        SELECT t.account, t.statement, t.trade_order_id, SUM(t.amount),
+               MIN(t.transaction_date), MAX(t.transaction_date),
+               SUM(CASE WHEN t.paid = 1 THEN 0 ELSE 1 END), COUNT(*),
+               MAX(CASE WHEN ow.rn = 1 THEN 1 ELSE 0 END)
+        FROM {FINANCE_TX_TABLE} t
+        LEFT JOIN owner ow ON ow.account = t.account AND ow.trade_order_id = t.trade_order_id
+                          AND ow.statement = t.statement
+        {where_sql}
+        GROUP BY t.account, t.statement, t.trade_order_id;
+    """
+    try:
+        with get_db_connection() as conn:
+            if not conn: return None
+
+            cursor = conn.cursor()
+            cursor.execute(sql, (settlements.PRICE_FEE_NAME, *params, *params))
+            return cursor.fetchall()
+    except Exception as e:
+        print(f"[DB ERROR] Failed to load settlements: {e}")
+        return None
+
+
+def _load_db_order_transactions(order_id: str) -> list[dict] | None:
+    """Stored finance transactions for one order (all accounts), oldest first. None if the DB is unreachable."""
+    sql = f"""
+        SELECT account, statement, transaction_date, transaction_type, fee_name, amount, paid
+        FROM {FINANCE_TX_TABLE}
+        WHERE trade_order_id = %s
+        ORDER BY transaction_date, fee_name;
+    """
+    try:
+        with get_db_connection() as conn:
+            if not conn: return None
+
+            cursor = conn.cursor()
+            cursor.execute(sql, (order_id,))
+            return [{
+                "account": row[0],
+                "statement": row[1],
+                "date": str(row[2])[:10] if row[2] else None,
+                "transaction_type": row[3],
+                "fee_name": row[4],
+                "amount": str(_d(row[5]).quantize(Decimal("0.01"))),
+                "amount_fmt": _fmt_pkr(row[5]),
+                "paid": bool(row[6]),
+            } for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"[DB ERROR] Failed to load finance transactions for {order_id}: {e}")
+        return None
+
+
+# --- END SETTLEMENT DATABASE FUNCTIONS ---
+
+
 # ---------- API calls (No changes needed) ----------
-def _orders_list(created_after_iso: str, statuses=None):
-    # ... (API logic remains identical to original code) ...
-    lim = "50"
-    offsets = ["0"]
+def _order_summary(o: dict) -> dict:
+    """Raw Daraz order (from /orders/get or /order/get) -> cached order summary."""
+    oid = str(o.get('order_id'))
+    name = f"{o.get('customer_first_name', '') or ''} {o.get('customer_last_name', '') or ''}".strip()
+    addr_ship = o.get('address_shipping') or {}
+    if not name:
+        name = f"{addr_ship.get('first_name', '') or ''} {addr_ship.get('last_name', '') or ''}".strip()
+    address = _join_address(addr_ship)
+    phone = addr_ship.get('phone') or addr_ship.get('phone2') or ""
+    return {
+        'order_id': oid,
+        'created_at_raw': o.get('created_at', ''),
+        'order_date': _parse_order_date_str(o.get('created_at', '')),
+        'price': o.get('price', '0.00'),
+        'customer': {'name': name or "", 'address': address or "", 'phone': phone or ""},
+        'statuses': o.get('statuses') or [],
+        'status_flags': int(order_flags(o.get('statuses'))),
+    }
+
+
+def _order_get(order_id: str, account: DarazAccount | None = None) -> dict | None:
+    """Single order summary via /order/get (used for push-driven refreshes)."""
+    acct = account or DEFAULT_ACCOUNT
+    req = LazopRequest('/order/get', 'GET')
+    req.add_api_param('access_token', acct.access_token)
+    req.add_api_param('order_id', order_id)
+    resp = acct.execute(req)
+    o = (getattr(resp, "body", {}) or {}).get('data') or {}
+    return _order_summary(o) if o.get('order_id') else None
+
+
+def _orders_list(created_after_iso: str, statuses=None, account: DarazAccount | None = None):
+    """
+    Order summaries for every status in `statuses` (None: all), paging /orders/get
+    with offset/limit until a short page.
+    """
+    acct = account or DEFAULT_ACCOUNT
+    lim = ORDERS_PAGE_LIMIT
     status_list = statuses or [None]
     seen = {}
 
     for status in status_list:
-        for offset in offsets:
+        offset = 0
+        while True:
             req = LazopRequest('/orders/get', 'GET')
-            req.add_api_param('access_token', ACCESS_TOKEN)
+            req.add_api_param('access_token', acct.access_token)
             req.add_api_param('sort_direction', 'DESC')
-            req.add_api_param('offset', offset)
+            req.add_api_param('offset', str(offset))
             req.add_api_param('created_after', created_after_iso)
-            req.add_api_param('limit', lim)
+            req.add_api_param('limit', str(lim))
             req.add_api_param('update_after', created_after_iso)
             req.add_api_param('sort_by', 'updated_at')
             if status:
                 req.add_api_param('status', status)
 
-            resp = client.execute(req)
+            resp = acct.execute(req)
             orders = (getattr(resp, "body", {}) or {}).get('data', {}).get('orders', []) or []
 
             for o in orders:
                 oid = str(o.get('order_id'))
                 if oid in seen: continue
-                name = f"{o.get('customer_first_name', '') or ''} {o.get('customer_last_name', '') or ''}".strip()
-                addr_ship = o.get('address_shipping') or {}
-                if not name:
-                    name = f"{addr_ship.get('first_name', '') or ''} {addr_ship.get('last_name', '') or ''}".strip()
-                address = _join_address(addr_ship)
-                phone = addr_ship.get('phone') or addr_ship.get('phone2') or ""
-                seen[oid] = {
-                    'order_id': oid,
-                    'created_at_raw': o.get('created_at', ''),
-                    'order_date': _parse_order_date_str(o.get('created_at', '')),
-                    'price': o.get('price', '0.00'),
-                    'customer': {'name': name or "", 'address': address or "", 'phone': phone or ""},
-                    'statuses': o.get('statuses') or []
-                }
+                seen[oid] = _order_summary(o)
+            if len(orders) < lim:
+                break
+            offset += lim
     return list(seen.values())
 
 
-def _items_with_tracking(order_id: str, order_statuses=None):
+def _items_with_tracking(order_id: str, order_statuses=None, account: DarazAccount | None = None):
+    acct = account or DEFAULT_ACCOUNT
     # Items
     it_req = LazopRequest('/order/items/get', 'GET')
-    it_req.add_api_param('access_token', ACCESS_TOKEN)
+    it_req.add_api_param('access_token', acct.access_token)
     it_req.add_api_param('order_id', order_id)
-    it_res = client.execute(it_req)
+    it_res = acct.execute(it_req)
     items = (getattr(it_res, "body", {}) or {}).get('data', []) or []
 
     # Tracking
     tr_req = LazopRequest('/logistic/order/trace', 'GET')
-    tr_req.add_api_param('access_token', ACCESS_TOKEN)
+    tr_req.add_api_param('access_token', acct.access_token)
     tr_req.add_api_param('order_id', order_id)
-    tr_res = client.execute(tr_req)
+    tr_res = acct.execute(tr_req)
     tr_body = getattr(tr_res, "body", {}) or {}
     tr_result = tr_body.get('result', {}) or {}
     tr_data = tr_result.get('data', []) or []
@@ -387,7 +970,7 @@ def _items_with_tracking(order_id: str, order_statuses=None):
     if order_statuses:
         for s in reversed(order_statuses):
             if s:
-                order_status_text = s.replace('_', ' ').title()
+                order_status_text = display_label(s)
                 break
 
     rows = []
@@ -400,20 +983,26 @@ def _items_with_tracking(order_id: str, order_statuses=None):
             final_status = "Un-Booked"
         else:
             item_status = (it.get('status') or it.get('order_item_status') or "").strip()
-            final_status = item_status.replace('_', ' ').title() if item_status else (order_status_text or "N/A")
+            final_status = display_label(item_status) if item_status else (order_status_text or "N/A")
 
+        status_code, status_flags = classify(final_status)
+        image = it.get('product_main_image', '')
         rows.append({
             'key': _item_key(it),
-            'item_image': it.get('product_main_image', ''),
+            'item_image': image,
+            'item_thumb': f"/img/{THUMBNAILS.register(image)}" if image else "",
             'item_title': format_title(it.get('name'), it.get('variation')),
             'quantity': it.get('quantity', 1),
             'tracking_number': tnum,
-            'status': final_status
+            'status': final_status,
+            'status_code': int(status_code),
+            'status_flags': int(status_flags),
         })
     return rows
 
 
-def _finance_for_order(order_id: str, order_date_str: str, order_total_str: str):
+def _finance_for_order(order_id: str, order_date_str: str, order_total_str: str,
+                       account: DarazAccount | None = None):
     """
     Returns:
       net_total_num (Decimal), net_total_fmt (str), statement_text (str),
@@ -426,15 +1015,16 @@ def _finance_for_order(order_id: str, order_date_str: str, order_total_str: str)
     start_date = (od - timedelta(days=1)).strftime("%Y-%m-%d")
     end_date = (od + timedelta(days=120)).strftime("%Y-%m-%d")
 
+    acct = account or DEFAULT_ACCOUNT
     req = LazopRequest('/finance/transaction/details/get', 'GET')
-    req.add_api_param('access_token', ACCESS_TOKEN)
+    req.add_api_param('access_token', acct.access_token)
     req.add_api_param('offset', '0')
     req.add_api_param('limit', '500')
     req.add_api_param('start_time', start_date)
     req.add_api_param('end_time', end_date)
     req.add_api_param('trade_order_id', order_id)
 
-    res = client.execute(req)
+    res = acct.execute(req)
     rows = (getattr(res, "body", {}) or {}).get("data", []) or []
 
     # 🔒 If there are NO finance rows at all, treat as "invoice not generated"
@@ -478,32 +1068,198 @@ def _finance_for_order(order_id: str, order_date_str: str, order_total_str: str)
     return net_total_num, net_total_fmt, statement_text, paid_status_label, breakdown
 
 
-# -------- LOAD RAW DATA ON STARTUP (once) --------
+def _finance_page(acct: DarazAccount, start: date, end: date, offset: int, limit: int) -> list[dict]:
+    """One page of an account's finance transactions dated start..end (all orders)."""
+    req = LazopRequest('/finance/transaction/details/get', 'GET')
+    req.add_api_param('access_token', acct.access_token)
+    req.add_api_param('offset', str(offset))
+    req.add_api_param('limit', str(limit))
+    req.add_api_param('start_time', start.strftime("%Y-%m-%d"))
+    req.add_api_param('end_time', end.strftime("%Y-%m-%d"))
+
+    res = acct.execute(req)
+    if res.code not in (None, "0"):
+        raise RuntimeError(f"finance transactions {start}..{end} offset {offset}: {res.code} {res.message}")
+    return (getattr(res, "body", {}) or {}).get("data", []) or []
+
+
+# -------- LOAD RAW DATA IN THE BACKGROUND (once) --------
+# The app serves immediately; RAW_ORDERS_CACHE fills up progressively while HYDRATION
+# tracks progress for the "syncing X/Y" banner and /readyz.
 RAW_ORDERS_CACHE = []
+ORDERS_BY_ID = {}  # order_id -> the same dict held in RAW_ORDERS_CACHE
+SEARCH_INDEX = OrderSearchIndex()  # kept in step with RAW_ORDERS_CACHE by _upsert_order/_remove_order
+
+# Live stats for open tabs are running totals per distinct tab filter. Each order's share
+# (vendor liability, collected net profit) is remembered with its row version, so a change
+# re-prices only the changed orders and moves the totals by the difference: a cost save or
+# a push never rebuilds the full view, and stats never fetch finance from Daraz.
+STATS_CONTRIB = {}  # order_id -> (row version, account, order date, {vendor: liability}, collected profit)
+_stats_totals = {}  # (from, to, account) -> [{vendor: liability}, collected profit, (account, date bounds)]
+_stats_lock = threading.Lock()
+
+# TQM_IMAGE_FETCHER="module:function" swaps the CDN fetcher for a local stub (tests, benchmarks)
+THUMBNAILS = ThumbnailStore(THUMB_DIR, max_bytes=int(THUMB_MAX_MB * 1024 * 1024), size=THUMB_SIZE,
+                            fetcher=fetcher_from_spec(os.getenv("TQM_IMAGE_FETCHER")))
+_orders_lock = threading.Lock()
 LOAD_ERROR = None
 
-# Perform a basic check for DB connectivity at startup as well
-try:
-    # Use a dummy user_id 'placeholder' since auth isn't fully set up here.
-    USER_ID_PLACEHOLDER = os.getenv("USER_ID", "default-user-id")
-
-    if not get_db_connection():
-        LOAD_ERROR = "Failed to connect to the database at startup. Check environment variables (DB_SERVER, DB_DATABASE, DB_USERNAME, DB_PASSWORD)."
-        print(f"[startup] {LOAD_ERROR}")
-
-    # Continue with API data loading (original logic)
-    summaries = _orders_list(CREATED_AFTER_ISO, statuses=STATUSES_EXCEPT_CANCELED)
-    RAW_ORDERS_CACHE = []
-    for s in summaries:
-        items_list = _items_with_tracking(s['order_id'], order_statuses=s.get('statuses'))
-        # store only raw order summary + raw items; finance computed on-demand & cached into this dict
-        RAW_ORDERS_CACHE.append({**s, 'items_list': items_list})
-    print(f"[startup] Loaded {len(RAW_ORDERS_CACHE)} unique orders since {CREATED_AFTER_DISPLAY}.")
-except Exception as e:
-    # This catches Daraz API errors primarily
-    if not LOAD_ERROR:  # Don't overwrite DB error if already set
-        LOAD_ERROR = str(e)
-        print(f"[startup] API Error: {LOAD_ERROR}")
+# Use a dummy user_id 'placeholder' since auth isn't fully set up here.
+USER_ID_PLACEHOLDER = os.getenv("USER_ID", "default-user-id")
+
+HYDRATION = {
+    "state": "pending",  # orders: pending -> syncing -> ready | error
+    # database: None until the first check; retried in the background until it succeeds
+    "db_ok": None,
+    "db_error": None,
+    "started_at": None,
+    "finished_at": None,
+    # per account: {"state", "done", "total" (None until the order list is fetched), "error"}
+    "accounts": {name: {"state": "pending", "done": 0, "total": None, "error": None} for name in ACCOUNTS},
+}
+_hydration_lock = threading.Lock()
+_hydration_thread = None
+_db_connect_thread = None
+
+
+def _hydrate():
+    """Background startup load: DB check (retried on its own thread), one isolated pipeline per Daraz account."""
+    global LOAD_ERROR
+    HYDRATION.update(state="syncing", started_at=time.time())
+    _ensure_db_connect_started()
+
+    # Accounts sync in parallel: a slow or throttled storefront never stalls the others
+    threads = [threading.Thread(target=_hydrate_account, args=(acct,), name=f"tqm-hydrate-{acct.name}", daemon=True)
+               for acct in ACCOUNTS.values()]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    states = HYDRATION["accounts"].values()
+    if all(st["state"] == "error" for st in states):
+        LOAD_ERROR = "; ".join(f"{name}: {st['error']}" for name, st in HYDRATION["accounts"].items())
+    HYDRATION.update(state="error" if LOAD_ERROR else "ready", finished_at=time.time())
+    # tabs opened mid-load rendered partial totals: push cards for the complete cache
+    _reset_stats_totals()
+    _publish_stats()
+
+
+def _db_connect_loop():
+    """
+    Startup DB check. A failure no longer fails the whole load: retry with exponential
+    backoff until the database answers, then load costs/payments and start the change poll.
+    """
+    delay = DB_RETRY_MIN_SECONDS
+    while True:
+        error = None
+        try:
+            conn = get_db_connection(retries=1, delay=0)
+        except Exception as e:
+            # not only pymssql.Error: e.g. TypeError from pymssql.connect when DB_* are unset
+            conn, error = None, e
+        if conn:
+            conn.close()
+            HYDRATION.update(db_ok=True, db_error=None)
+            _sync_db_changes()
+            _ensure_db_poll_started()
+            _publish_stats()
+            return
+        HYDRATION.update(db_ok=False, db_error=(
+            "Database unavailable, retrying"
+            + (f" ({type(error).__name__}: {error})" if error else "")
+            + ". Check environment variables (DB_SERVER, DB_DATABASE, DB_USERNAME, DB_PASSWORD)."))
+        print(f"[startup] Database connection failed{f': {error}' if error else ''}; retrying in {delay:.0f}s.")
+        time.sleep(delay)
+        delay = min(delay * 2, DB_RETRY_MAX_SECONDS)
+
+
+def _ensure_db_connect_started():
+    global _db_connect_thread
+    if HYDRATION["db_ok"] or (_db_connect_thread and _db_connect_thread.is_alive()):
+        return
+    _db_connect_thread = threading.Thread(target=_db_connect_loop, name="tqm-db-connect", daemon=True)
+    _db_connect_thread.start()
+
+
+def _hydrate_account(acct: DarazAccount):
+    st = HYDRATION["accounts"][acct.name]
+    st.update(state="syncing", done=0, total=None, error=None)
+    try:
+        summaries = _orders_list(CREATED_AFTER_ISO, statuses=STATUSES_EXCEPT_CANCELED, account=acct)
+        st["total"] = len(summaries)
+        for s in summaries:
+            items_list = _items_with_tracking(s['order_id'], order_statuses=s.get('statuses'), account=acct)
+            # store only raw order summary + raw items; finance computed on-demand & cached into this dict
+            _upsert_order({**s, 'account': acct.name, 'items_list': items_list})
+            st["done"] += 1
+        st["state"] = "ready"
+        print(f"[startup] [{acct.name}] Loaded {st['done']} unique orders since {CREATED_AFTER_DISPLAY}.")
+    except Exception as e:
+        # This catches Daraz API errors primarily
+        st.update(state="error", error=str(e))
+        print(f"[startup] [{acct.name}] API Error: {e}")
+
+    if acct.poll_seconds > 0:
+        threading.Thread(target=_safety_poll_loop, args=(acct,), name=f"tqm-safety-poll-{acct.name}",
+                         daemon=True).start()
+
+
+def _upsert_order(entry: dict) -> dict:
+    """Insert or update one cached order in place (keeps RAW_ORDERS_CACHE order and identity)."""
+    with _orders_lock:
+        existing = ORDERS_BY_ID.get(entry["order_id"])
+        if existing is not None:
+            existing.update(entry)
+        else:
+            RAW_ORDERS_CACHE.append(entry)
+            ORDERS_BY_ID[entry["order_id"]] = existing = entry
+        existing["version"] = next(_versions)
+    SEARCH_INDEX.add(existing)
+    # warm the thumbnail cache in the background so the detail modal opens instantly
+    THUMBNAILS.prefetch(it.get("item_image") for it in existing.get("items_list") or [])
+    return existing
+
+
+def _remove_order(order_id: str):
+    with _orders_lock:
+        entry = ORDERS_BY_ID.pop(order_id, None)
+        if entry is not None:
+            RAW_ORDERS_CACHE.remove(entry)
+    SEARCH_INDEX.remove(order_id)
+    FRAGMENTS.discard_row(order_id)
+
+
+def _ensure_hydration_started():
+    """
+    Start the background load once per process. Safe to call on every request: with
+    gunicorn --preload the thread started in the master does not survive the fork, so
+    each worker starts its own on first request.
+    """
+    global _hydration_thread
+    if HYDRATION["state"] in ("ready", "error") or (_hydration_thread and _hydration_thread.is_alive()):
+        if not HYDRATION["db_ok"]:
+            # the DB retry thread does not survive a fork either
+            with _hydration_lock:
+                _ensure_db_connect_started()
+        return
+    with _hydration_lock:
+        if HYDRATION["state"] in ("ready", "error") or (_hydration_thread and _hydration_thread.is_alive()):
+            return
+        del RAW_ORDERS_CACHE[:]
+        ORDERS_BY_ID.clear()
+        SEARCH_INDEX.clear()
+        with _stats_lock:
+            STATS_CONTRIB.clear()
+            _stats_totals.clear()
+        HYDRATION["state"] = "pending"
+        for st in HYDRATION["accounts"].values():
+            st.update(state="pending", done=0, total=None, error=None)
+        _hydration_thread = threading.Thread(target=_hydrate, name="tqm-hydrate", daemon=True)
+        _hydration_thread.start()
+
+
+_ensure_hydration_started()
 
 
 def _ensure_finance(base: dict):
@@ -524,26 +1280,202 @@ def _ensure_finance(base: dict):
             base.get("invoice_breakdown") or [],
         )
     net_num, inv_fmt, stmt, paid, br = _finance_for_order(
-        base["order_id"], base.get("order_date"), base.get("price")
+        base["order_id"], base.get("order_date"), base.get("price"), account=_account(base.get("account"))
     )
     base["invoice_amount_num"] = str(net_num)
     base["invoice_amount"] = inv_fmt
     base["statement"] = stmt or ""
     base["paid_status"] = paid or ""
     base["invoice_breakdown"] = br or []
+    base["version"] = next(_versions)
     return net_num, inv_fmt, base["statement"], base["paid_status"], base["invoice_breakdown"]
 
 
-def _build_runtime_view(filtered_raw):
-    # --- LOAD FROM DATABASE ---
-    costs = _load_db_costs()
+# -------- PUSH UPDATES (Daraz webhooks) --------
+_push_pending = {}  # order_id -> account name (None: resolve from the cache / default)
+_push_cond = threading.Condition()
+_push_thread = None
+
+
+def _verify_push_signature(raw_body: bytes, signature: str | None) -> bool:
+    """
+    Daraz/Lazada push messages carry HMAC-SHA256(app_secret, app_key + body) as a hex
+    digest in the Authorization header (same key and digest as lazop.base.sign).
+    Accounts may belong to different apps, so any configured app key/secret pair is accepted.
+    """
+    if not signature:
+        return False
+    for app_key, app_secret in {(a.app_key, a.app_secret) for a in ACCOUNTS.values()}:
+        if not app_secret:
+            continue
+        expected = hmac.new(app_secret.encode("utf-8"), (app_key or "").encode("utf-8") + raw_body,
+                            digestmod=hashlib.sha256).hexdigest()
+        if hmac.compare_digest(expected.lower(), signature.strip().lower()):
+            return True
+    return False
+
+
+def _push_order_ids(payload) -> list[tuple[str, str | None]]:
+    """(order_id, account name or None) from one push message or a list of them."""
+    by_seller = {a.seller_id: a.name for a in ACCOUNTS.values() if a.seller_id}
+    ids = []
+    for msg in (payload if isinstance(payload, list) else [payload]):
+        if not isinstance(msg, dict):
+            continue
+        data = msg.get("data") or {}
+        oid = data.get("trade_order_id") or data.get("order_id") or msg.get("order_id")
+        if oid:
+            ids.append((str(oid), by_seller.get(str(msg.get("seller_id") or ""))))
+    return ids
+
+
+def _refresh_order(order_id: str, account: DarazAccount | None = None) -> str | None:
+    """
+    Re-fetch one order's summary, items, tracking and finance, then swap it into the cache.
+    Returns "updated", "removed" (canceled) or None (not found). Callers notify live tabs.
+    """
+    acct = account or DEFAULT_ACCOUNT
+    summary = _order_get(order_id, account=acct)
+    if summary is None:
+        return None
+    if any(str(st).lower() == "canceled" for st in summary.get("statuses") or []):
+        _remove_order(order_id)
+        return "removed"
+    fresh = {**summary, "account": acct.name,
+             "items_list": _items_with_tracking(order_id, order_statuses=summary.get("statuses"), account=acct)}
+    _ensure_finance(fresh)
+    _upsert_order(fresh)
+    return "updated"
+
+
+def _push_worker():
+    while True:
+        with _push_cond:
+            while not _push_pending:
+                _push_cond.wait()
+        # let the burst settle, then take everything queued so far
+        time.sleep(PUSH_COALESCE_SECONDS)
+        with _push_cond:
+            batch = dict(_push_pending)
+            _push_pending.clear()
+        updated, removed = [], []
+        for order_id, account_name in batch.items():
+            # a known order stays with the account it was loaded from
+            known = ORDERS_BY_ID.get(order_id)
+            acct = _account((known or {}).get("account") or account_name)
+            try:
+                outcome = _refresh_order(order_id, account=acct)
+            except Exception as e:
+                print(f"[push] [{acct.name}] Failed to refresh order {order_id}: {e}")
+                continue
+            if outcome == "updated":
+                updated.append(order_id)
+            elif outcome == "removed":
+                removed.append(order_id)
+        # one notification (and one stats push) for the whole batch
+        for order_id in removed:
+            _notify_order_removed(order_id, publish_stats=False)
+        if updated:
+            _notify_orders_changed(updated)
+        elif removed:
+            _publish_stats()
+        print(f"[push] Refreshed {len(batch)} order(s).")
+
+
+def _queue_order_refresh(order_ids, account_name: str | None = None):
+    """order_ids: ids (all for account_name) or (order_id, account_name) pairs."""
+    global _push_thread
+    with _push_cond:
+        for oid in order_ids:
+            oid, name = oid if isinstance(oid, tuple) else (oid, account_name)
+            if name or oid not in _push_pending:
+                _push_pending[oid] = name
+        if _push_thread is None or not _push_thread.is_alive():
+            _push_thread = threading.Thread(target=_push_worker, name="tqm-push", daemon=True)
+            _push_thread.start()
+        _push_cond.notify()
+
+
+def _safety_poll_loop(acct: DarazAccount):
+    """Slow re-poll of one account's /orders/get; queues only new or status-changed orders."""
+    while True:
+        time.sleep(acct.poll_seconds)
+        try:
+            summaries = _orders_list(CREATED_AFTER_ISO, statuses=STATUSES_EXCEPT_CANCELED, account=acct)
+            changed = [s["order_id"] for s in summaries
+                       if (ORDERS_BY_ID.get(s["order_id"]) or {}).get("statuses") != s["statuses"]]
+            if changed:
+                _queue_order_refresh(changed, account_name=acct.name)
+            print(f"[poll] [{acct.name}] Safety poll: {len(changed)} changed order(s).")
+        except Exception as e:
+            print(f"[poll] [{acct.name}] Safety poll failed: {e}")
+
+
+def _cost_items(base: dict, costs: dict):
+    """
+    Price one cached order's items from a cost snapshot (no finance needed).
+    Returns (items, effective product cost total, packaging total, is_order_returned).
+    """
+    # Is whole order returned? (flags are set at ingest; classify older entries once)
+    order_status_flags = base.get("status_flags")
+    if order_status_flags is None:
+        order_status_flags = base["status_flags"] = int(order_flags(base.get("statuses")))
+    is_order_returned = bool(order_status_flags & FLAG_RETURNED)
+
+    # recompute costs from latest DB load
+    prod_total_eff = Decimal("0")
+    pack_total = Decimal("0")
+    items = []
+
+    for it in base.get("items_list", []):
+        key = it.get("key")
+        rec = costs.get(key) if key else None
+
+        # Note: Costs are loaded as strings but _d() handles conversion to Decimal
+        pc = _d(rec.get("product_cost")) if rec else Decimal("0")
+        pk = _d(rec.get("packaging")) if rec else Decimal("0")
+        vend = (rec.get("vendor") if rec else "") or "Other"
+        qty = _d(it.get("quantity") or 1)
+
+        item_status_flags = it.get("status_flags")
+        if item_status_flags is None:
+            item_status_flags = it["status_flags"] = int(classify(it.get("status"))[1])
+        is_item_returned = is_order_returned or bool(item_status_flags & FLAG_RETURNED)
+
+        # --- CRITICAL LOGIC FOR ORDER VIEW (Effective Cost) ---
+        # If item is returned/failed, effective product cost is ZERO, only packaging is paid.
+        eff_pc = Decimal("0") if is_item_returned else pc
+        # ------------------------------------------------------
+
+        prod_total_eff += eff_pc * qty
+        pack_total += pk * qty
+
+        items.append({
+            **it,
+            "product_cost": str(pc),
+            "packaging": str(pk),
+            "vendor": vend,
+            "needs_cost": (rec is None),
+            "is_returned": is_item_returned,
+        })
+    return items, prod_total_eff, pack_total, is_order_returned
+
+
+def _build_runtime_view(filtered_raw, costs: dict | None = None):
+    # --- LOAD FROM DATABASE (unless the caller passes a cost snapshot) ---
+    if costs is None:
+        with metrics.stage("db_costs"):
+            costs = _costs_snapshot()
     # --------------------------
 
     view = []
+    finance_seconds = 0.0  # summed here and recorded once: a metrics observation per order is too costly
 
     for base in filtered_raw:
         # finance (ensure cached on RAW_ORDERS_CACHE)
+        t0 = time.perf_counter()
         net_num, inv_fmt, statement, paid_status, breakdown = _ensure_finance(base)
+        finance_seconds += time.perf_counter() - t0
 
         # If invoice not generated, force invoice to 0
         if not inv_fmt or str(inv_fmt).strip() in ("", "None"):
@@ -551,57 +1483,14 @@ def _build_runtime_view(filtered_raw):
             net_num = Decimal("0")
             breakdown = {}
 
-        # Is whole order returned?
-        order_statuses = [str(s or "").lower() for s in (base.get("statuses") or [])]
-        is_order_returned = any(
-            (s and (
-                    s.lower() == "returned"
-                    or "return" in s.lower()
-                    or "buyer delivery failed" in s.lower()
-                    or "package returned" in s.lower()
-            ))
-            for s in order_statuses
-        )
-
-        # recompute costs from latest DB load
-        prod_total_eff = Decimal("0")
-        pack_total = Decimal("0")
-        items = []
-
-        for it in base.get("items_list", []):
-            key = it.get("key")
-            rec = costs.get(key) if key else None
-
-            # Note: Costs are loaded as strings but _d() handles conversion to Decimal
-            pc = _d(rec.get("product_cost")) if rec else Decimal("0")
-            pk = _d(rec.get("packaging")) if rec else Decimal("0")
-            vend = (rec.get("vendor") if rec else "") or "Other"
-            qty = _d(it.get("quantity") or 1)
-
-            status_text = (it.get("status") or "").lower()
-            is_item_returned = is_order_returned or ("return" in status_text)
-
-            # --- CRITICAL LOGIC FOR ORDER VIEW (Effective Cost) ---
-            # If item is returned/failed, effective product cost is ZERO, only packaging is paid.
-            eff_pc = Decimal("0") if is_item_returned else pc
-            # ------------------------------------------------------
-
-            prod_total_eff += eff_pc * qty
-            pack_total += pk * qty
-
-            items.append({
-                **it,
-                "product_cost": str(pc),
-                "packaging": str(pk),
-                "vendor": vend,
-                "needs_cost": (rec is None),
-                "is_returned": is_item_returned,
-            })
+        items, prod_total_eff, pack_total, is_order_returned = _cost_items(base, costs)
 
         net_profit_num = net_num - prod_total_eff - pack_total
 
         view.append({
             "order_id": base["order_id"],
+            "version": _row_version(base),
+            "account": base.get("account", DEFAULT_ACCOUNT.name),
             "order_date": base.get("order_date", ""),
             "price": base.get("price", "0.00"),
             "customer": base.get("customer", {}),
@@ -617,74 +1506,128 @@ def _build_runtime_view(filtered_raw):
             "net_profit_num": str(net_profit_num),
             "is_order_returned": is_order_returned,  # Added for consistency in stats calculation
         })
+    metrics.record_stage("finance", finance_seconds)
+    # finance may have just been fetched for some of these orders: keep live stats in step
+    _update_stats_contributions(filtered_raw, costs)
     return view
 
 
+def _row_version(base: dict) -> str:
+    """
+    Version of an order's view row: the order's own version plus the newest version
+    among its items' costs (both only grow, so any change yields a new pair).
+    """
+    if "version" not in base:
+        base["version"] = next(_versions)
+    cost_version = max((COSTS_VERSION.get(it.get("key"), 0) for it in base.get("items_list", [])), default=0)
+    return f"{base['version']}.{cost_version}"
+
+
+def _account_filter(name: str | None) -> str | None:
+    """Validated ?account= value (None = all accounts)."""
+    name = (name or "").strip()
+    return name if name in ACCOUNTS else None
+
+
+def _in_account(o: dict, account: str | None) -> bool:
+    return not account or o.get("account", DEFAULT_ACCOUNT.name) == account
+
+
 def _within_range(od: str, start: str | None, end: str | None) -> bool:
     """od, start, end are 'YYYY-MM-DD' strings."""
+    return _date_in_bounds(_parse_order_date(od), _range_bounds(start, end))
+
+
+def _parse_order_date(od: str) -> date | None:
     if not od:
-        return False
+        return None
     try:
-        d = datetime.strptime(od, "%Y-%m-%d").date()
+        return datetime.strptime(od, "%Y-%m-%d").date()
     except Exception:
-        return False
+        return None
+
+
+def _range_bounds(start: str | None, end: str | None) -> tuple:
+    """Parsed (start, end) for _date_in_bounds; an unparseable bound is ignored (None)."""
+    s = e = None
     if start:
         try:
             s = datetime.strptime(start, "%Y-%m-%d").date()
-            if d < s: return False
         except:
             pass
     if end:
         try:
             e = datetime.strptime(end, "%Y-%MM-%d").date()
-            if d > e: return False
         except:
             pass
+    return s, e
+
+
+def _date_in_bounds(d: date | None, bounds: tuple) -> bool:
+    if d is None:
+        return False
+    s, e = bounds
+    if s and d < s: return False
+    if e and d > e: return False
     return True
 
 
-def _compute_stats(orders_view):
+def _add_liability(liability_split: dict, items) -> dict:
+    """Add priced items' (see _cost_items) vendor cost liability to liability_split, per vendor."""
+    for it in items:
+        qty = _d(it.get("quantity") or 1)
+        pc = _d(it.get("product_cost"))
+        pk = _d(it.get("packaging"))
+        vendor = (it.get("vendor") or "Other")
+
+        # Returned by order or item status (decided once in _cost_items from the status flags)
+        is_item_returned = it.get("is_returned", False)
+
+        # Effective Product Cost: 0 if returned, full cost otherwise.
+        eff_pc = Decimal("0") if is_item_returned else pc
+
+        # Total liability for this item = Effective Product Cost + Full Packaging Cost
+        line_cost = (eff_pc * qty) + (pk * qty)
+
+        # Accumulate liability per vendor
+        if vendor in liability_split:
+            liability_split[vendor] += line_cost
+        else:
+            liability_split["Other"] += line_cost
+    return liability_split
+
+
+def _compute_stats(orders_view, payments_made_split: dict | None = None, account: str | None = None):
     """
     MODIFIED: Calculates Total Vendor Cost Liability, Payments Made, and Net Payables
     on a per-vendor basis, as well as a grand total.
+    payments_made_split: per-vendor totals if the caller already has them (skips the DB query).
+    account: only count orders from this Daraz account. Vendor payments are not recorded
+    per storefront, so payments made stay the all-account totals.
     """
+    if account:
+        orders_view = [o for o in orders_view if _in_account(o, account)]
     # Initialize liability split based on VENDOR_CHOICES
     liability_split = {v: Decimal("0") for v in VENDOR_CHOICES}
     net_profit_collected = Decimal("0")
 
     # 1. Calculate Total Vendor Cost Liability (per vendor)
     for o in orders_view:
-        order_is_returned = o.get("is_order_returned", False)
-
-        for it in o.get("items_list", []):
-            qty = _d(it.get("quantity") or 1)
-            pc = _d(it.get("product_cost"))
-            pk = _d(it.get("packaging"))
-            vendor = (it.get("vendor") or "Other")
-
-            # Determine if item is returned based on either order status or item status
-            status_text = (it.get("status") or "").lower()
-            is_item_returned = order_is_returned or ("return" in status_text)
-
-            # Effective Product Cost: 0 if returned, full cost otherwise.
-            eff_pc = Decimal("0") if is_item_returned else pc
-
-            # Total liability for this item = Effective Product Cost + Full Packaging Cost
-            line_cost = (eff_pc * qty) + (pk * qty)
-
-            # Accumulate liability per vendor
-            if vendor in liability_split:
-                liability_split[vendor] += line_cost
-            else:
-                liability_split["Other"] += line_cost
+        _add_liability(liability_split, o.get("items_list", []))
 
         # collected net profit (only if finance marked Paid)
         if str(o.get("paid_status", "")).lower().startswith("paid"):
             net_profit_collected += _d(o.get("net_profit_num") or 0)
 
     # 2. Get Total Payments Made (per vendor)
-    payments_made_split = _load_db_payments_total()  # This now returns a dict of vendor: amount
+    if payments_made_split is None:
+        payments_made_split = _payments_total()  # dict of vendor: amount
+
+    return _stats_from_totals(liability_split, net_profit_collected, payments_made_split)
+
 
+def _stats_from_totals(liability_split: dict, net_profit_collected: Decimal, payments_made_split: dict) -> dict:
+    """Stats cards from per-vendor liability, collected net profit and per-vendor payments."""
     # 3. Calculate Final Net Payables (per vendor and grand total)
     net_payables_raw_per_vendor = {}
     total_vendor_cost_raw = Decimal("0")
@@ -724,30 +1667,595 @@ def _compute_stats(orders_view):
     return stats
 
 
+# ---------- Settlement reconciliation ----------
+# Finance transactions are ingested per statement period into tqm_finance_transactions
+# (a paged sweep per date window, not a call per order). /api/settlements then matches
+# each statement's payout against the vendor cost liability of the orders it settled.
+# account -> {"state", "from", "to", "window", "pages", "rows", "started_at", "finished_at", "error"}
+SETTLEMENT_INGEST = {}
+_settlement_lock = threading.Lock()
+
+
+def _money(x) -> str:
+    return str(_d(x).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def _ingest_settlements(acct: DarazAccount, start: date, end: date):
+    st = SETTLEMENT_INGEST[acct.name]
+
+    def fetch(ws, we, offset, limit):
+        st["window"] = f"{ws}..{we}"
+        rows = _finance_page(acct, ws, we, offset, limit)
+        st["pages"] += 1
+        return rows
+
+    def store(rows):
+        if not _save_db_finance_rows(rows):
+            raise RuntimeError("Database error saving finance transactions.")
+        st["rows"] += len(rows)
+
+    try:
+        settlements.ingest_period(fetch, acct.name, start, end, store, _d,
+                                  window_days=FINANCE_WINDOW_DAYS, page_limit=FINANCE_PAGE_LIMIT)
+        st.update(state="ready", window=None)
+        print(f"[settlements] [{acct.name}] Ingested {st['rows']} transaction(s) for {start}..{end} "
+              f"in {st['pages']} page(s).")
+    except Exception as e:
+        st.update(state="error", error=str(e))
+        print(f"[settlements] [{acct.name}] Ingest failed: {e}")
+    st["finished_at"] = time.time()
+
+
+def _start_settlement_ingest(acct: DarazAccount, start: date, end: date) -> bool:
+    """Ingest start..end for one account in the background. False if one is already running."""
+    with _settlement_lock:
+        st = SETTLEMENT_INGEST.get(acct.name)
+        if st and st["state"] == "syncing":
+            return False
+        SETTLEMENT_INGEST[acct.name] = {
+            "state": "syncing", "from": start.isoformat(), "to": end.isoformat(), "window": None,
+            "pages": 0, "rows": 0, "started_at": time.time(), "finished_at": None, "error": None,
+        }
+    threading.Thread(target=_ingest_settlements, args=(acct, start, end), name=f"tqm-settlements-{acct.name}",
+                     daemon=True).start()
+    return True
+
+
+def _reconcile_settlements(agg_rows, with_orders: bool = False) -> list[dict]:
+    """
+    Group _load_db_settlement_rows output by (account, statement) and match each
+    statement's payout against the vendor liability of the orders it settled, priced
+    from the current cost snapshot exactly as in _compute_stats. An order's liability
+    is charged only to the statement that owns it; its other statements carry just
+    their payout delta. Orders missing from the local cache are reported as unmatched
+    and left out of the margin.
+    """
+    costs = _costs_snapshot()
+    statements = {}
+    for account, statement, order_id, payout, first, last, unpaid, n, owns in agg_rows:
+        payout = _d(payout)
+        first = str(first)[:10] if first else None
+        last = str(last)[:10] if last else None
+        st = statements.get((account, statement))
+        if st is None:
+            st = statements[(account, statement)] = {
+                "account": account, "statement": statement, "period_start": first, "period_end": last,
+                "orders": 0, "transactions": 0, "unpaid_transactions": 0, "payout": Decimal("0"),
+                "liability": {v: Decimal("0") for v in VENDOR_CHOICES},
+                "unmatched_orders": 0, "unmatched_payout": Decimal("0"), "order_rows": [],
+            }
+        if first and (st["period_start"] is None or first < st["period_start"]):
+            st["period_start"] = first
+        if last and (st["period_end"] is None or last > st["period_end"]):
+            st["period_end"] = last
+        st["orders"] += 1
+        st["transactions"] += int(n)
+        st["unpaid_transactions"] += int(unpaid or 0)
+        st["payout"] += payout
+
+        base = ORDERS_BY_ID.get(order_id)
+        matched = base is not None and base.get("account", DEFAULT_ACCOUNT.name) == account
+        liability = {v: Decimal("0") for v in VENDOR_CHOICES}
+        if matched:
+            if owns:
+                _add_liability(liability, _cost_items(base, costs)[0])
+                for vendor, amount in liability.items():
+                    st["liability"][vendor] += amount
+        else:
+            st["unmatched_orders"] += 1
+            st["unmatched_payout"] += payout
+
+        if with_orders:
+            liability_total = sum(liability.values(), Decimal("0"))
+            st["order_rows"].append({
+                "order_id": order_id,
+                "matched": matched,
+                "transactions": int(n),
+                "paid": not unpaid,
+                "owns_liability": bool(owns),
+                "payout": _money(payout),
+                "payout_fmt": _fmt_pkr(payout),
+                "liability": {v: _money(a) for v, a in liability.items()},
+                "liability_total": _money(liability_total),
+                "margin": _money(payout - liability_total) if matched else None,
+            })
+
+    out = []
+    for st in sorted(statements.values(), key=lambda s: (s["period_start"] or "", s["account"], s["statement"]),
+                     reverse=True):
+        liability_total = sum(st["liability"].values(), Decimal("0"))
+        margin = st["payout"] - st["unmatched_payout"] - liability_total
+        row = {
+            "account": st["account"],
+            "statement": st["statement"],
+            "period_start": st["period_start"],
+            "period_end": st["period_end"],
+            "orders": st["orders"],
+            "transactions": st["transactions"],
+            "paid": st["unpaid_transactions"] == 0,
+            "payout": _money(st["payout"]),
+            "payout_fmt": _fmt_pkr(st["payout"]),
+            "liability": {v: _money(a) for v, a in st["liability"].items()},
+            "liability_total": _money(liability_total),
+            "liability_total_fmt": _fmt_pkr(liability_total),
+            "margin": _money(margin),  # matched payout minus vendor liability
+            "margin_fmt": _fmt_pkr(margin),
+            "unmatched_orders": st["unmatched_orders"],
+            "unmatched_payout": _money(st["unmatched_payout"]),
+        }
+        if with_orders:
+            row["order_rows"] = sorted(st["order_rows"], key=lambda r: r["order_id"])
+        out.append(row)
+    return out
+
+
+# ---------- Live updates (Server-Sent Events) ----------
+# Each /api/events connection gets its own queue, registered with the tab's filters.
+# Writers publish small diffs: ("orders", [view rows]), ("order_removed", order_id),
+# ("payment", {...}) and ("stats", card values for that tab's filters). Stats cover this
+# worker's full RAW_ORDERS_CACHE, like "/", so they never depend on which rows this worker
+# happens to have rendered (see STATS_CONTRIB below). Events are per process.
+_subscribers = {}  # queue -> (from, to, account) filters of that dashboard tab
+_subscribers_lock = threading.Lock()
+SSE_QUEUE_SIZE = 256
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _put(q: queue.Queue, item):
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        # slow client: drop it, EventSource reconnects and gets a fresh page
+        with _subscribers_lock:
+            _subscribers.pop(q, None)
+
+
+def _publish(event: str, data):
+    with _subscribers_lock:
+        subscribers = list(_subscribers)
+    for q in subscribers:
+        _put(q, (event, data))
+
+
+def _publish_stats():
+    """Push the stats cards to every tab, from the running totals of its filters."""
+    with _subscribers_lock:
+        subscribers = list(_subscribers.items())
+    if not subscribers:
+        return
+    payments_split = _payments_total()
+    costs = _costs_snapshot()
+    by_filter = {}
+    with _stats_lock:
+        for _, filters in subscribers:
+            if filters not in by_filter:
+                liability, collected, _ = _stats_totals_for(filters, costs)
+                by_filter[filters] = _stats_payload(liability, collected, payments_split)
+    for q, filters in subscribers:
+        _put(q, ("stats", by_filter[filters]))
+
+
+def _order_contribution(base: dict, costs: dict) -> tuple:
+    """An order's share of the stats cards, priced like _build_runtime_view from cached finance only."""
+    version = _row_version(base)
+    known = STATS_CONTRIB.get(base["order_id"])
+    if known is not None and known[0] == version:
+        return known
+    items, prod_total_eff, pack_total, _ = _cost_items(base, costs)
+    liability = _add_liability({v: Decimal("0") for v in VENDOR_CHOICES}, items)
+    collected = Decimal("0")
+    inv_fmt = base.get("invoice_amount")
+    if inv_fmt and str(inv_fmt).strip() not in ("", "None") and \
+            str(base.get("paid_status") or "").lower().startswith("paid"):
+        collected = _d(base.get("invoice_amount_num") or 0) - prod_total_eff - pack_total
+    return (version, base.get("account", DEFAULT_ACCOUNT.name), _parse_order_date(base.get("order_date", "")),
+            liability, collected)
+
+
+def _contribution_matches(contrib: tuple, match: tuple) -> bool:
+    """match: (account, date bounds) as stored with the totals (see _stats_totals_for)."""
+    account_q, bounds = match
+    return (not account_q or contrib[1] == account_q) and _date_in_bounds(contrib[2], bounds)
+
+
+def _apply_contribution(order_id: str, new: tuple | None):
+    """Swap an order's remembered share for `new` (None: removed) and shift the totals. Holds _stats_lock."""
+    old = STATS_CONTRIB.pop(order_id, None)
+    if new is not None:
+        STATS_CONTRIB[order_id] = new
+    for totals in _stats_totals.values():
+        for contrib, sign in ((old, -1), (new, 1)):
+            if contrib is not None and _contribution_matches(contrib, totals[2]):
+                for vendor, amount in contrib[3].items():
+                    totals[0][vendor] += sign * amount
+                totals[1] += sign * contrib[4]
+
+
+def _update_stats_contributions(bases, costs: dict):
+    """Re-price the given cached orders' stats shares where their row version moved."""
+    if not _stats_totals:
+        return  # no open tab: shares are re-checked by version when totals are next built
+    with _stats_lock:
+        for base in bases:
+            contrib = _order_contribution(base, costs)
+            if STATS_CONTRIB.get(base["order_id"]) is not contrib:
+                _apply_contribution(base["order_id"], contrib)
+
+
+def _stats_totals_for(filters: tuple, costs: dict) -> list:
+    """Running totals for one tab filter, built with one pass over the cache the first time. Holds _stats_lock."""
+    totals = _stats_totals.get(filters)
+    if totals is not None:
+        return totals
+    start_q, end_q, account_q = filters
+    match = (account_q, _range_bounds(start_q, end_q))
+    liability = {v: Decimal("0") for v in VENDOR_CHOICES}
+    collected = Decimal("0")
+    for base in list(RAW_ORDERS_CACHE):
+        contrib = _order_contribution(base, costs)
+        if STATS_CONTRIB.get(base["order_id"]) is not contrib:
+            _apply_contribution(base["order_id"], contrib)
+        if _contribution_matches(contrib, match):
+            for vendor, amount in contrib[3].items():
+                liability[vendor] += amount
+            collected += contrib[4]
+    totals = _stats_totals[filters] = [liability, collected, match]
+    return totals
+
+
+def _reset_stats_totals():
+    """Forget all running totals (after a bulk load); the next publish rebuilds them."""
+    with _stats_lock:
+        _stats_totals.clear()
+
+
+def _notify_orders_changed(order_ids, publish_stats: bool = True):
+    """Rebuild only the given orders' view rows (costs from COSTS_CACHE) and push them."""
+    if not _subscribers:
+        return
+    ids = set(order_ids)
+    changed_raw = [o for o in RAW_ORDERS_CACHE if o["order_id"] in ids]
+    if not changed_raw:
+        return
+    rows = _build_runtime_view(changed_raw, costs=_costs_snapshot())
+    _publish("orders", rows)
+    if publish_stats:
+        _publish_stats()
+
+
+def _notify_costs_changed(item_keys, publish_stats: bool = True):
+    keys = set(item_keys)
+    affected = [o["order_id"] for o in RAW_ORDERS_CACHE
+                if any(it.get("key") in keys for it in o.get("items_list") or [])]
+    if affected:
+        _notify_orders_changed(affected, publish_stats=publish_stats)
+
+
+def _notify_order_removed(order_id: str, publish_stats: bool = True):
+    with _stats_lock:
+        _apply_contribution(order_id, None)
+    _publish("order_removed", order_id)
+    if publish_stats:
+        _publish_stats()
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _stats_payload(liability_split: dict, net_profit_collected: Decimal, payments_split: dict) -> dict:
+    stats = _stats_from_totals(liability_split, net_profit_collected, payments_split)
+    stats["net_payables_positive"] = stats.pop("net_payables_raw") > 0
+    return stats
+
+
+# ---------- Rendered fragment cache ----------
+# Rows (and their ORDERS_DATA JSON) sit in one slot per order tagged with the row version
+# from _build_runtime_view, stats cards are keyed by their values, so unchanged fragments
+# are reused as-is and a warm "/" only joins strings. A new row version overwrites the slot.
+FRAGMENTS = FragmentCache(FRAGMENT_CACHE_SIZE)
+
+
+def _render_row(row: dict) -> str:
+    return FRAGMENTS.row_part(row["order_id"], row["version"], ROW_HTML,
+                              lambda: render_template("_order_row.html", order=row))
+
+
+def _row_json(row: dict) -> str:
+    # same output as the template's `tojson` filter
+    return FRAGMENTS.row_part(row["order_id"], row["version"], ROW_JSON,
+                              lambda: htmlsafe_json_dumps(row, dumps=app.json.dumps))
+
+
+def _render_stats_cards(stats: dict) -> str:
+    key = ("stats",) + tuple(sorted((k, str(v)) for k, v in stats.items()))
+    return FRAGMENTS.get_or_render(key, lambda: render_template("_stats_cards.html", stats=stats))
+
+
 # ---------- Routes ----------
+@app.before_request
+def _before_request_hydrate():
+    _ensure_hydration_started()
+
+
+def _hydration_status() -> dict:
+    accounts = {name: dict(st) for name, st in HYDRATION["accounts"].items()}
+    totals = [st["total"] for st in accounts.values()]
+    account_errors = "; ".join(f"{name}: {st['error']}" for name, st in accounts.items() if st["error"])
+    return {
+        "state": HYDRATION["state"],
+        "done": sum(st["done"] for st in accounts.values()),
+        "total": None if any(t is None for t in totals) else sum(totals),
+        "db_ok": HYDRATION["db_ok"],
+        # ready to serve: orders loaded (at least one account) and the database reachable
+        "ready": HYDRATION["state"] == "ready" and bool(HYDRATION["db_ok"]),
+        "error": "; ".join(e for e in (LOAD_ERROR or account_errors, HYDRATION["db_error"]) if e) or None,
+        "accounts": accounts,
+    }
+
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving."""
+    return jsonify({"ok": True})
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 once orders are loaded and the database is reachable, 503 until then."""
+    status = _hydration_status()
+    return jsonify({"ok": status["ready"], **status}), (200 if status["ready"] else 503)
+
+
 @app.route("/")
 def page():
-    if LOAD_ERROR:
+    if LOAD_ERROR and not RAW_ORDERS_CACHE:
         # Now handles both API and initial DB connection errors
         return f"<h3>Application Startup Error</h3><pre>{LOAD_ERROR}</pre>", 502
 
-    # Date filters (do NOT refetch from Daraz; filter the cached set)
+    # Date / account filters (do NOT refetch from Daraz; filter the cached set)
     start_q = request.args.get("from") or CREATED_AFTER_DISPLAY
     end_q = request.args.get("to") or None
+    account_q = _account_filter(request.args.get("account"))
+
+    with metrics.stage("filter"):
+        filtered_raw = [o for o in RAW_ORDERS_CACHE if _within_range(o.get("order_date", ""), start_q, end_q)
+                        and _in_account(o, account_q)]
+    # build_view includes the nested db_costs and finance stages
+    with metrics.stage("build_view"):
+        orders_view = _build_runtime_view(filtered_raw)
+    with metrics.stage("stats"):
+        stats = _compute_stats(orders_view, account=account_q)
+
+    with metrics.stage("render"):
+        rows_html = Markup("\n".join(_render_row(row) for row in orders_view))
+        orders_json = Markup("[" + ",".join(_row_json(row) for row in orders_view) + "]")
+        return render_template(
+            "tqm.html",
+            orders=orders_view,
+            rows_html=rows_html,
+            orders_json=orders_json,
+            stats_html=Markup(_render_stats_cards(stats)),
+            created_after=start_q,
+            created_before=end_q or "",
+            selected_account=account_q or "",
+            stats=stats,
+            vendors=VENDOR_CHOICES,
+            sync=_hydration_status(),
+        )
+
+
+# tqm_product_costs.product_cost / packaging are DECIMAL(12, 2)
+COST_MAX_INTEGER_DIGITS = 10
+COST_DECIMALS = 2
+
+
+def _parse_amount(x) -> Decimal | None:
+    """Strict amount parse for imports: "1,250.00" -> Decimal, anything non-numeric -> None."""
+    try:
+        d = Decimal(str(x if x is not None else "").replace(",", "").strip())
+    except Exception:
+        return None
+    return d if d.is_finite() else None
+
+
+def _clean_cost_row(data: dict, strict: bool = False) -> tuple[dict | None, str | None]:
+    """
+    Validate one cost payload. Returns (row, None) on success or (None, error message).
+    Single saves (strict=False) keep the dashboard's lenient rules: _d() turns blanks and
+    junk into 0 and an unknown vendor becomes "Other". Bulk imports (strict=True) reject
+    non-numeric, negative or out-of-range amounts (DECIMAL(12, 2) columns) and unknown
+    vendors instead of silently coercing them.
+    """
+    key = str(data.get("key") or data.get("item_key") or "").strip()
+    if not key:
+        return None, "Missing item key"
+
+    vendor = str(data.get("vendor") or "Other").strip() or "Other"
+    if not strict:
+        # _d handles cleaning input ("1,250.00" -> 1250.00, blank -> 0)
+        pc = _d(data.get("product_cost"))
+        pk = _d(data.get("packaging"))
+        if vendor not in VENDOR_CHOICES:
+            vendor = "Other"
+        return {"key": key, "product_cost": str(pc), "packaging": str(pk), "vendor": vendor}, None
+
+    pc = _parse_amount(data.get("product_cost"))
+    pk = _parse_amount(data.get("packaging"))
+    if pc is None or pk is None:
+        bad = [name for name, v in (("product_cost", pc), ("packaging", pk)) if v is None]
+        return None, f"Invalid {' and '.join(bad)} (must be a number)"
+    if pc < 0 or pk < 0:
+        return None, "Amounts must not be negative"
+    for name, v in (("product_cost", pc), ("packaging", pk)):
+        # rejected here rather than letting one row fail (or be rounded by) the whole MERGE
+        if v >= Decimal(10) ** COST_MAX_INTEGER_DIGITS:
+            return None, f"{name} is too large (at most {COST_MAX_INTEGER_DIGITS} digits before the decimal point)"
+        if v != v.quantize(Decimal(1).scaleb(-COST_DECIMALS)):
+            return None, f"{name} has more than {COST_DECIMALS} decimal places"
+    if vendor not in VENDOR_CHOICES:
+        return None, f"Unknown vendor {vendor!r} (use one of: {', '.join(VENDOR_CHOICES)})"
+
+    return {"key": key, "product_cost": str(pc), "packaging": str(pk), "vendor": vendor}, None
+
+
+def _parse_bulk_cost_payload() -> tuple[list[dict], str | None]:
+    """
+    Read raw cost rows from the request: a JSON list / {"rows": [...]},
+    a CSV body (text/csv) or an uploaded CSV file field named "file".
+    CSV header: item_key (or key), product_cost, packaging, vendor (optional); header
+    names are matched case-insensitively and surrounding spaces are ignored.
+    Returns (rows, None) or ([], error message) for a CSV with missing columns.
+    """
+    upload = request.files.get("file")
+    if upload is not None:
+        text = upload.read().decode("utf-8-sig")
+    elif "csv" in (request.content_type or ""):
+        text = request.get_data(as_text=True)
+    else:
+        data = request.get_json(force=True, silent=True)
+        if isinstance(data, dict):
+            data = data.get("rows")
+        return ([r for r in (data or []) if isinstance(r, dict)] if isinstance(data, list) else []), None
+
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    if reader.fieldnames is None:
+        return [], None
+    reader.fieldnames = [(h or "").strip().lower() for h in reader.fieldnames]
+    missing = [c for c in ("product_cost", "packaging") if c not in reader.fieldnames]
+    if "item_key" not in reader.fieldnames and "key" not in reader.fieldnames:
+        missing.insert(0, "item_key")
+    if missing:
+        return [], f"CSV is missing column(s): {', '.join(missing)}."
+    return list(reader), None
+
+
+@app.get("/api/events")
+def api_events():
+    """
+    SSE stream of dashboard diffs for the page's filters (?from=&to=&account=, same as "/").
+    Events: order (rendered row + row data), order_removed, stats (card values), payment.
+    Needs a threaded/async worker (gunicorn --threads or gevent): each open tab holds one
+    worker thread/greenlet for its whole lifetime, and only sees changes made in (or
+    synced into) that worker's process.
+    """
+    start_q = request.args.get("from") or CREATED_AFTER_DISPLAY
+    end_q = request.args.get("to") or None
+    account_q = _account_filter(request.args.get("account"))
+    q = queue.Queue(maxsize=SSE_QUEUE_SIZE)
+    # build this filter's running totals here, on the tab's own thread, not in a later save
+    costs = _costs_snapshot()
+    with _stats_lock:
+        _stats_totals_for((start_q, end_q, account_q), costs)
+    with _subscribers_lock:
+        _subscribers[q] = (start_q, end_q, account_q)
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event, data = q.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event == "orders":
+                    for row in data:
+                        if _within_range(row.get("order_date", ""), start_q, end_q) and _in_account(row, account_q):
+                            html = _render_row(row)
+                            yield _sse("order", {"order": row, "html": html})
+                elif event == "stats":
+                    yield _sse("stats", data)
+                else:
+                    yield _sse(event, {"order_id": data} if event == "order_removed" else data)
+        finally:
+            with _subscribers_lock:
+                _subscribers.pop(q, None)
+                still_open = (start_q, end_q, account_q) in _subscribers.values()
+            if not still_open:
+                with _stats_lock:
+                    _stats_totals.pop((start_q, end_q, account_q), None)
+
+    return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/api/search")
+def api_search():
+    """
+    Search cached orders by order id, customer name/phone/address, SKU, item title or
+    tracking number. Prefix matching, all terms must match. ?q=0300 lahore&limit=20&account=
+    """
+    q = (request.args.get("q") or "").strip()
+    account_q = _account_filter(request.args.get("account"))
+    try:
+        limit = max(1, min(int(request.args.get("limit") or SEARCH_LIMIT_DEFAULT), SEARCH_LIMIT_MAX))
+    except ValueError:
+        return jsonify({"ok": False, "error": "Invalid limit."}), 400
+
+    t0 = time.perf_counter()
+    hits = SEARCH_INDEX.search(q, limit=limit, account=account_q)
+    took_ms = (time.perf_counter() - t0) * 1000
+
+    results = []
+    for order_id, score in hits:
+        o = ORDERS_BY_ID.get(order_id)
+        if o is None:
+            continue
+        results.append({
+            "order_id": order_id,
+            "account": o.get("account", DEFAULT_ACCOUNT.name),
+            "order_date": o.get("order_date", ""),
+            "customer": o.get("customer", {}),
+            "statuses": o.get("statuses") or [],
+            "tracking_numbers": [it.get("tracking_number") for it in o.get("items_list") or []],
+            "score": score,
+        })
+    return jsonify({"ok": True, "q": q, "results": results, "took_ms": round(took_ms, 3)})
+
+
+@app.get("/img/<h>")
+def img(h):
+    """
+    Cached product thumbnail (WebP when the browser accepts it, else JPEG). Thumbnails are
+    keyed by the source URL's hash, so they never change and are cached by browsers for a year.
+    Falls back to the original CDN image if it cannot be fetched.
+    """
+    found = THUMBNAILS.get(h, THUMBNAILS.preferred_format(request.headers.get("Accept", "")))
+    if found is None:
+        source = THUMBNAILS.source_url(h)
+        return redirect(source, 302) if source else ("Not found", 404)
+    path, mimetype = found
+    resp = send_file(path, mimetype=mimetype, max_age=THUMB_MAX_AGE, conditional=True)
+    resp.headers["Cache-Control"] = f"public, max-age={THUMB_MAX_AGE}, immutable"
+    resp.headers["Vary"] = "Accept"
+    return resp
 
-    filtered_raw = [o for o in RAW_ORDERS_CACHE if _within_range(o.get("order_date", ""), start_q, end_q)]
-    orders_view = _build_runtime_view(filtered_raw)
-    stats = _compute_stats(orders_view)
-
-    # Note: tqm.html is not provided, assuming it exists
-    return render_template(
-        "tqm.html",
-        orders=orders_view,
-        created_after=start_q,
-        created_before=end_q or "",
-        stats=stats,
-        vendors=VENDOR_CHOICES,
-    )
+
+@app.get("/api/status_titles")
+def api_status_titles():
+    """Daraz statuses / tracking titles not in statuses.KNOWN_TITLES, most frequent first."""
+    return jsonify({"ok": True, "unknown": unknown_titles()})
 
 
 @app.post("/api/save_cost")
@@ -757,30 +2265,59 @@ def api_save_cost():
     Saves to tqm_product_costs table.
     """
     data = request.get_json(force=True, silent=True) or {}
-    key = (data.get("key") or "").strip()
-    if not key:
-        return jsonify({"ok": False, "error": "Missing item key"}), 400
-
-    try:
-        # Convert to Decimal/string for storage, _d handles cleaning input
-        pc = str(_d(data.get("product_cost")))
-        pk = str(_d(data.get("packaging")))
-    except Exception:
-        return jsonify({"ok": False, "error": "Invalid amounts"}), 400
-
-    vendor = (data.get("vendor") or "Other").strip()
-    if vendor not in VENDOR_CHOICES:
-        vendor = "Other"
+    row, error = _clean_cost_row(data)
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
 
     # --- DATABASE SAVE ---
-    success = _save_db_cost(key, pc, pk, vendor)
+    success = _save_db_cost(row["key"], row["product_cost"], row["packaging"], row["vendor"])
     if not success:
         return jsonify({"ok": False, "error": "Database error saving cost."}), 500
     # ---------------------
+    _notify_costs_changed(_apply_costs_to_cache([row]))
 
     return jsonify({"ok": True})
 
 
+@app.post("/api/save_costs_bulk")
+def api_save_costs_bulk():
+    """
+    Bulk cost import. Accepts JSON ([{...}, ...] or {"rows": [...]}) or CSV
+    (text/csv body or multipart "file") with the same fields as /api/save_cost.
+    All rows are validated first (amounts must be non-negative numbers, vendor one of
+    VENDOR_CHOICES or blank for "Other"); nothing is written if any row is invalid.
+    Duplicate keys in one upload: the last row wins.
+    """
+    raw_rows, error = _parse_bulk_cost_payload()
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+    if not raw_rows:
+        return jsonify({"ok": False, "error": "No cost rows found in request."}), 400
+
+    cleaned = {}
+    errors = []
+    for i, data in enumerate(raw_rows, start=1):
+        row, error = _clean_cost_row(data, strict=True)
+        if error:
+            errors.append({"row": i, "key": str(data.get("key") or data.get("item_key") or ""), "error": error})
+            continue
+        cleaned[row["key"]] = row
+
+    if errors:
+        return jsonify({"ok": False, "error": f"{len(errors)} invalid row(s).", "errors": errors}), 400
+
+    rows = list(cleaned.values())
+
+    # --- DATABASE SAVE (single transaction) ---
+    success = _save_db_costs_bulk(rows)
+    if not success:
+        return jsonify({"ok": False, "error": "Database error saving costs."}), 500
+    # ------------------------------------------
+    _notify_costs_changed(_apply_costs_to_cache(rows))
+
+    return jsonify({"ok": True, "saved": len(rows)})
+
+
 @app.post("/api/record_payment")
 def api_record_payment():
     """
@@ -810,6 +2347,8 @@ def api_record_payment():
     if not success:
         return jsonify({"ok": False, "error": "Database error recording payment."}), 500
     # ---------------------
+    # picks up this payment (and any other instance's writes), updates totals and notifies dashboards
+    _sync_db_changes()
 
     return jsonify({"ok": True})
 
@@ -817,15 +2356,144 @@ def api_record_payment():
 @app.get("/api/get_payments")
 def api_get_payments():
     """
-    NEW ENDPOINT: Fetches the list of all vendor payments for the history modal.
+    Paged vendor payment history for the history modal.
+    Query: ?limit=50&cursor=<next_cursor>&vendor=Tick Bags&from=YYYY-MM-DD&to=YYYY-MM-DD
     """
     user_id = os.getenv("USER_ID", "default-user-id")  # Using placeholder for user ID
 
+    vendor = (request.args.get("vendor") or "").strip() or None
+    if vendor and vendor not in VENDOR_CHOICES:
+        return jsonify({"ok": False, "error": "Invalid vendor selected."}), 400
+    date_from = (request.args.get("from") or "").strip() or None
+    date_to = (request.args.get("to") or "").strip() or None
+    try:
+        limit = int(request.args.get("limit") or PAYMENTS_PAGE_DEFAULT)
+        for d in (date_from, date_to):
+            if d: datetime.strptime(d, "%Y-%m-%d")
+        _decode_payment_cursor(request.args.get("cursor"))
+    except ValueError:
+        return jsonify({"ok": False, "error": "Invalid limit, cursor or date format (use YYYY-MM-DD)."}), 400
+
     # --- DATABASE LOAD ---
-    history = _load_db_vendor_payments(user_id)
+    history, next_cursor = _load_db_vendor_payments(
+        user_id, limit=limit, cursor=request.args.get("cursor"),
+        vendor=vendor, date_from=date_from, date_to=date_to,
+    )
     # ---------------------
 
-    return jsonify({"ok": True, "history": history})
+    return jsonify({"ok": True, "history": history, "next_cursor": next_cursor})
+
+
+@app.post("/api/settlements/ingest")
+def api_settlements_ingest():
+    """
+    Pull finance transactions for a statement period into tqm_finance_transactions
+    (runs in the background; poll GET /api/settlements/ingest for progress).
+    Body JSON: {"from": "2025-10-01", "to": "2025-10-31", "account": "tickbags"} (no account = all)
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    name = (data.get("account") or "").strip()
+    if name and name not in ACCOUNTS:
+        return jsonify({"ok": False, "error": "Unknown account."}), 400
+    try:
+        start = datetime.strptime((data.get("from") or "").strip(), "%Y-%m-%d").date()
+        end = datetime.strptime((data.get("to") or "").strip(), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"ok": False, "error": "Invalid date format (use YYYY-MM-DD)."}), 400
+    if end < start:
+        return jsonify({"ok": False, "error": "'to' must not be before 'from'."}), 400
+
+    started, busy = [], []
+    for acct in ([ACCOUNTS[name]] if name else ACCOUNTS.values()):
+        (started if _start_settlement_ingest(acct, start, end) else busy).append(acct.name)
+    if not started:
+        return jsonify({"ok": False, "error": "An ingest is already running.", "busy": busy}), 409
+    return jsonify({"ok": True, "started": started, "busy": busy}), 202
+
+
+@app.get("/api/settlements/ingest")
+def api_settlements_ingest_status():
+    return jsonify({"ok": True, "accounts": SETTLEMENT_INGEST})
+
+
+@app.get("/api/settlements")
+def api_settlements():
+    """
+    Month-end reconciliation from locally ingested finance transactions: per statement,
+    Daraz payout vs the vendor cost liability of the orders it settled.
+    Query: ?from=YYYY-MM-DD&to=YYYY-MM-DD&account= (statements with any transaction in range)
+    """
+    account_q = _account_filter(request.args.get("account"))
+    date_from = (request.args.get("from") or "").strip() or None
+    date_to = (request.args.get("to") or "").strip() or None
+    try:
+        for d in (date_from, date_to):
+            if d: datetime.strptime(d, "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"ok": False, "error": "Invalid date format (use YYYY-MM-DD)."}), 400
+
+    rows = _load_db_settlement_rows(account_q, date_from=date_from, date_to=date_to)
+    if rows is None:
+        return jsonify({"ok": False, "error": "Database error loading settlements."}), 500
+    statements = _reconcile_settlements(rows)
+
+    payout = sum((_d(s["payout"]) for s in statements), Decimal("0"))
+    liability = sum((_d(s["liability_total"]) for s in statements), Decimal("0"))
+    margin = sum((_d(s["margin"]) for s in statements), Decimal("0"))
+    totals = {
+        "payout": _money(payout), "payout_fmt": _fmt_pkr(payout),
+        "liability_total": _money(liability), "liability_total_fmt": _fmt_pkr(liability),
+        "liability": {v: _money(sum((_d(s["liability"][v]) for s in statements), Decimal("0")))
+                      for v in VENDOR_CHOICES},
+        "margin": _money(margin), "margin_fmt": _fmt_pkr(margin),
+        "unmatched_orders": sum(s["unmatched_orders"] for s in statements),
+    }
+    return jsonify({"ok": True, "statements": statements, "totals": totals})
+
+
+@app.get("/api/settlements/statement")
+def api_settlement_statement():
+    """One statement with its per-order payout / liability rows. Query: ?statement=...&account="""
+    statement = (request.args.get("statement") or "").strip()
+    if not statement:
+        return jsonify({"ok": False, "error": "Missing statement."}), 400
+    rows = _load_db_settlement_rows(_account_filter(request.args.get("account")), statement=statement)
+    if rows is None:
+        return jsonify({"ok": False, "error": "Database error loading settlements."}), 500
+    statements = _reconcile_settlements(rows, with_orders=True)
+    if not statements:
+        return jsonify({"ok": False, "error": "Statement not found."}), 404
+    return jsonify({"ok": True, "statements": statements})
+
+
+@app.get("/api/settlements/order/<order_id>")
+def api_settlement_order(order_id):
+    """Ingested finance transactions for one order."""
+    transactions = _load_db_order_transactions(order_id)
+    if transactions is None:
+        return jsonify({"ok": False, "error": "Database error loading transactions."}), 500
+    return jsonify({"ok": True, "order_id": order_id, "transactions": transactions})
+
+
+@app.post("/webhooks/daraz")
+def webhook_daraz():
+    """
+    Daraz push notification receiver. Verifies the Authorization signature, queues the
+    affected order ids for a coalesced background refresh and acknowledges immediately.
+    """
+    raw = request.get_data()
+    if not _verify_push_signature(raw, request.headers.get("Authorization")):
+        return jsonify({"ok": False, "error": "Invalid signature."}), 401
+
+    try:
+        payload = json.loads(raw or b"{}")
+    except ValueError:
+        return jsonify({"ok": False, "error": "Invalid JSON."}), 400
+
+    order_ids = _push_order_ids(payload)
+    if order_ids:
+        _queue_order_refresh(order_ids)
+    return jsonify({"ok": True, "queued": len(order_ids)})
 
 
 if __name__ == "__main__":
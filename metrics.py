@@ -0,0 +1,178 @@
+"""
+Lightweight request instrumentation for the TQM dashboard.
+
+- stage("name") timers, recorded per request (Server-Timing header) and globally
+  (tqm_stage_seconds histogram)
+- count("api_calls") style per-request counters (also exported as Prometheus counters)
+- timed_call() latency histograms for outbound calls (Daraz API per endpoint, DB connects)
+- optional sampling profiler: TQM_PROFILE_SAMPLE_RATE=0.05 profiles ~5% of requests with
+  cProfile and writes the stats to TQM_PROFILE_DIR (default ./profiles)
+- /metrics in Prometheus text exposition format
+
+No external dependencies; everything is in-process and thread-safe.
+"""
+import os
+import cProfile
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request, Response
+
+# Latency buckets in seconds (Daraz calls are 100ms-10s, DB connects up to the retry budget)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROFILE_SAMPLE_RATE = float(os.getenv("TQM_PROFILE_SAMPLE_RATE", "0") or 0)
+PROFILE_DIR = os.getenv("TQM_PROFILE_DIR", "profiles")
+
+_lock = threading.Lock()
+_histograms = {}  # name -> {"help": str, "series": {labels_tuple: [bucket_counts, sum, count]}}
+_counters = {}  # name -> {"help": str, "series": {labels_tuple: value}}
+
+
+def _labels_key(labels: dict | None) -> tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+def observe(name: str, seconds: float, labels: dict | None = None, help_text: str = ""):
+    """Record one observation into histogram `name`."""
+    key = _labels_key(labels)
+    with _lock:
+        h = _histograms.setdefault(name, {"help": help_text, "series": {}})
+        series = h["series"].get(key)
+        if series is None:
+            series = h["series"][key] = [[0] * len(DEFAULT_BUCKETS), 0.0, 0]
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if seconds <= bound:
+                series[0][i] += 1
+        series[1] += seconds
+        series[2] += 1
+
+
+def inc(name: str, labels: dict | None = None, value: float = 1, help_text: str = ""):
+    """Increment global counter `name`."""
+    key = _labels_key(labels)
+    with _lock:
+        c = _counters.setdefault(name, {"help": help_text, "series": {}})
+        c["series"][key] = c["series"].get(key, 0) + value
+
+
+def count(name: str, value: int = 1):
+    """Per-request counter (e.g. api_calls, db_calls); also feeds tqm_<name>_total."""
+    inc(f"tqm_{name}_total", value=value)
+    if has_request_context():
+        counts = g.setdefault("tqm_counts", {})
+        counts[name] = counts.get(name, 0) + value
+
+
+def record_stage(name: str, seconds: float):
+    """Record time already measured for a stage (e.g. summed over a loop) as one observation."""
+    observe("tqm_stage_seconds", seconds, {"stage": name}, "Time spent per page() stage")
+    if has_request_context():
+        stages = g.setdefault("tqm_stages", {})
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as a named stage of the current request (and globally)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0)
+
+
+@contextmanager
+def timed_call(metric: str, counter: str, labels: dict | None = None, help_text: str = ""):
+    """Latency histogram + per-request counter around one outbound call."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(metric, time.perf_counter() - t0, labels, help_text)
+        count(counter)
+
+
+def render_prometheus() -> str:
+    lines = []
+    with _lock:
+        for name, h in sorted(_histograms.items()):
+            if h["help"]:
+                lines.append(f"# HELP {name} {h['help']}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, (buckets, total, n) in sorted(h["series"].items()):
+                for bound, c in zip(DEFAULT_BUCKETS, buckets):
+                    lines.append(f"{name}_bucket{_fmt_labels(key, (('le', bound),))} {c}")
+                lines.append(f"{name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {n}")
+                lines.append(f"{name}_sum{_fmt_labels(key)} {total}")
+                lines.append(f"{name}_count{_fmt_labels(key)} {n}")
+        for name, c in sorted(_counters.items()):
+            if c["help"]:
+                lines.append(f"# HELP {name} {c['help']}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(c["series"].items()):
+                lines.append(f"{name}{_fmt_labels(key)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _server_timing_header() -> str:
+    parts = []
+    for name, dt in (g.get("tqm_stages") or {}).items():
+        parts.append(f"{name};dur={dt * 1000:.1f}")
+    for name, n in (g.get("tqm_counts") or {}).items():
+        parts.append(f'{name};desc="{n}"')
+    total = time.perf_counter() - g.tqm_t0
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def init_app(app):
+    """Install request hooks and the /metrics endpoint on `app`."""
+
+    @app.before_request
+    def _tqm_before():
+        g.tqm_t0 = time.perf_counter()
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            g.tqm_profiler = cProfile.Profile()
+            g.tqm_profiler.enable()
+
+    @app.after_request
+    def _tqm_after(response):
+        if "tqm_t0" not in g:
+            return response
+        endpoint = request.endpoint or "unknown"
+        observe("tqm_http_request_seconds", time.perf_counter() - g.tqm_t0,
+                {"endpoint": endpoint}, "Flask request latency per endpoint")
+        inc("tqm_http_requests_total", {"endpoint": endpoint, "status": response.status_code})
+        response.headers["Server-Timing"] = _server_timing_header()
+        return response
+
+    @app.teardown_request
+    def _tqm_teardown(exc):
+        # teardown also runs when the view raised (after_request does not), so a failing
+        # request never leaves the profiler enabled
+        profiler = g.pop("tqm_profiler", None)
+        if profiler is None:
+            return
+        profiler.disable()
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            out = os.path.join(PROFILE_DIR, f"{request.endpoint or 'unknown'}-{int(time.time() * 1000)}.prof")
+            profiler.dump_stats(out)
+            print(f"[profile] {request.path} -> {out}")
+        except OSError as e:
+            print(f"[profile] could not write profile for {request.path}: {e}")
+
+    @app.get("/metrics")
+    def metrics():
+        return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
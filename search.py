@@ -0,0 +1,295 @@
+"""
+In-memory inverted index over cached orders for /api/search.
+
+Indexed fields (with ranking weights): order_id, items' tracking_number, customer phone,
+item keys (SKUs), customer name, item titles and address. Every query token must
+prefix-match some indexed token (AND); orders are ranked by summed field weight, exact
+token matches counting double, then by most recent order date. A query made only of
+digits and phone punctuation ("+92 372 5513150", "0372-5513150") is joined into one
+number and matched in any of the phone forms the index stores.
+
+Prefix lookup uses a sorted token list (bisect). New tokens are buffered and merged into
+the sorted list on the next query, and removed tokens are skipped until a periodic
+compaction, so indexing during a sync stays O(1) per token.
+
+Each token's orders are also kept ranked by (weight, order date), built on first use. A
+one-term query merges the ranked lists of the tokens it expands to and stops after
+`limit` orders, so "lahore" costs O(limit) however many orders live in Lahore. A
+multi-term query probes the other terms only against the rarest term's best
+MAX_CANDIDATES orders.
+"""
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+
+FIELD_WEIGHTS = {
+    "order_id": 10,
+    "tracking": 8,
+    "phone": 8,
+    "sku": 6,
+    "name": 4,
+    "title": 2,
+    "address": 1,
+}
+# cap on distinct tokens one query token may expand to (e.g. "a" as a prefix)
+MAX_PREFIX_EXPANSION = 5000
+# multi-term queries: best-ranked orders of the rarest term that the other terms are checked against
+MAX_CANDIDATES = 1000
+
+_split = re.compile(r"[^0-9a-z]+")
+_phone_query = re.compile(r"^[0-9+()\-.\s]*[0-9][0-9+()\-.\s]*$")
+
+
+def tokenize(text) -> list[str]:
+    return [t for t in _split.split(str(text or "").lower()) if t]
+
+
+def _phone_tokens(phone) -> list[str]:
+    digits = re.sub(r"\D", "", str(phone or ""))
+    if not digits:
+        return []
+    # 923001234567 / 03001234567 / 3001234567 all reach the same number: index the
+    # number as stored plus its 0-prefixed and bare national forms
+    if digits.startswith("92") and len(digits) > 10:
+        national = digits[2:]
+    elif digits.startswith("0"):
+        national = digits[1:]
+    else:
+        national = digits
+    return list(dict.fromkeys([digits, "0" + national, national]))
+
+
+def query_terms(query) -> list[tuple[str, ...]]:
+    """
+    Query -> AND-ed terms, each a tuple of alternative prefixes. Phone-like queries become
+    one term: the joined digits, the 0-prefixed form for an international +92 number, and
+    the query as typed (tracking numbers and SKUs are also indexed whole, e.g. "123-456").
+    """
+    text = str(query or "")
+    if _phone_query.match(text):
+        digits = re.sub(r"\D", "", text)
+        alts = [digits]
+        if digits.startswith("92") and len(digits) > 10:
+            alts.append("0" + digits[2:])
+        alts.append(re.sub(r"\s+", "", text).lower())
+        return [tuple(dict.fromkeys(alts))]
+    return [(t,) for t in dict.fromkeys(tokenize(text))]
+
+
+def order_tokens(order: dict) -> dict[str, int]:
+    """token -> best field weight for one cached order (RAW_ORDERS_CACHE entry)."""
+    weights = {}
+
+    def add(tokens, field):
+        w = FIELD_WEIGHTS[field]
+        for t in tokens:
+            if weights.get(t, 0) < w:
+                weights[t] = w
+
+    customer = order.get("customer") or {}
+    add([str(order.get("order_id") or "")], "order_id")
+    add(_phone_tokens(customer.get("phone")), "phone")
+    add(tokenize(customer.get("name")), "name")
+    add(tokenize(customer.get("address")), "address")
+    for it in order.get("items_list") or []:
+        tnum = str(it.get("tracking_number") or "")
+        if tnum and tnum != "N/A":
+            add([tnum.lower()] + tokenize(tnum), "tracking")
+        key = str(it.get("key") or "")
+        if key:
+            add([key.lower()] + tokenize(key), "sku")
+        add(tokenize(it.get("item_title")), "title")
+    weights.pop("", None)
+    return weights
+
+
+class OrderSearchIndex(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}  # token -> {order_id: weight}
+        self._doc_tokens = {}  # order_id -> {token: weight} (re-index/removal, candidate probes)
+        self._doc_rank = {}  # order_id -> order_date (tie-break: newest first)
+        self._doc_account = {}  # order_id -> account name (search(account=...) filter)
+        self._ranked = {}  # token -> its order_ids by (weight, order date) ascending; built on first use
+        self._sorted = []  # sorted tokens (may include dead ones, see _dead)
+        self._pending = set()  # new tokens not yet merged into _sorted
+        self._dead = set()  # tokens still in _sorted whose postings are gone
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    def _rank_key_locked(self, token: str):
+        posting, rank = self._postings[token], self._doc_rank
+        return lambda oid: (posting[oid], rank.get(oid, ""))
+
+    def _ranked_locked(self, token: str) -> list[str]:
+        ranked = self._ranked.get(token)
+        if ranked is None:
+            ranked = self._ranked[token] = sorted(self._postings[token], key=self._rank_key_locked(token))
+        return ranked
+
+    def _drop_posting_locked(self, token: str, order_id: str):
+        posting = self._postings.get(token)
+        if posting is None:
+            return
+        self._ranked.pop(token, None)
+        posting.pop(order_id, None)
+        if not posting:
+            del self._postings[token]
+            if token in self._pending:
+                self._pending.discard(token)
+            else:
+                self._dead.add(token)
+
+    def add(self, order: dict):
+        """Index (or re-index) one order; only tokens that changed are touched."""
+        order_id = str(order.get("order_id"))
+        tokens = order_tokens(order)
+        order_date = order.get("order_date") or ""
+        with self._lock:
+            for t in set(self._doc_tokens.get(order_id, ())).difference(tokens):
+                self._drop_posting_locked(t, order_id)
+            if self._doc_rank.get(order_id, order_date) != order_date:
+                for t in tokens:
+                    self._ranked.pop(t, None)
+            self._doc_rank[order_id] = order_date
+            for t, w in tokens.items():
+                posting = self._postings.get(t)
+                if posting is None:
+                    posting = self._postings[t] = {}
+                    if t in self._dead:
+                        self._dead.discard(t)
+                    else:
+                        self._pending.add(t)
+                known = posting.get(order_id)
+                if known == w:
+                    continue
+                posting[order_id] = w
+                ranked = self._ranked.get(t)
+                if ranked is not None:
+                    if known is None:
+                        insort(ranked, order_id, key=self._rank_key_locked(t))
+                    else:
+                        del self._ranked[t]  # weight moved: rebuilt on next use
+            self._doc_tokens[order_id] = tokens
+            self._doc_account[order_id] = order.get("account")
+
+    def remove(self, order_id: str):
+        order_id = str(order_id)
+        with self._lock:
+            for t in self._doc_tokens.pop(order_id, ()):
+                self._drop_posting_locked(t, order_id)
+            self._doc_rank.pop(order_id, None)
+            self._doc_account.pop(order_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._postings, self._doc_tokens, self._doc_rank, self._doc_account = {}, {}, {}, {}
+            self._ranked = {}
+            self._sorted, self._pending, self._dead = [], set(), set()
+
+    def _merge_locked(self):
+        if len(self._dead) > len(self._sorted) // 4:
+            self._sorted = sorted(self._postings)
+            self._pending.clear()
+            self._dead.clear()
+        elif self._pending:
+            # two sorted runs: Timsort merges them in linear time
+            self._sorted.extend(sorted(self._pending))
+            self._sorted.sort()
+            self._pending.clear()
+
+    def _expand_locked(self, prefix: str) -> list[str]:
+        out = []
+        i = bisect_left(self._sorted, prefix)
+        while i < len(self._sorted) and self._sorted[i].startswith(prefix) and len(out) < MAX_PREFIX_EXPANSION:
+            if self._sorted[i] in self._postings:
+                out.append(self._sorted[i])
+            i += 1
+        return out
+
+    def _top_locked(self, alts: tuple, matches: list[str], size: int, limit: int,
+                    account: str | None) -> list[tuple]:
+        """Best `limit` (order_id, score) for one term matching `size` postings in total."""
+        rank = self._doc_rank
+        if size <= len(matches) * 32:
+            # many small postings (e.g. "03" over phone numbers): scoring them all is cheaper
+            scores = {}
+            for t in matches:
+                bonus = 2 if t in alts else 1
+                for order_id, w in self._postings[t].items():
+                    if scores.get(order_id, 0) < w * bonus and (not account or self._doc_account.get(order_id) == account):
+                        scores[order_id] = w * bonus
+            return heapq.nlargest(limit, scores.items(), key=lambda kv: (kv[1], rank.get(kv[0], "")))
+
+        def ranked(t):
+            posting, bonus = self._postings[t], (2 if t in alts else 1)
+            for oid in reversed(self._ranked_locked(t)):
+                yield posting[oid] * bonus, rank.get(oid, ""), oid
+
+        # few large postings (e.g. "lahore"): merge their ranked lists and stop at `limit`
+        out, seen = [], set()
+        for score, _, oid in heapq.merge(*(ranked(t) for t in matches), key=lambda e: e[:2], reverse=True):
+            if oid in seen:
+                continue
+            seen.add(oid)  # merged best first: the first sighting carries the order's best score
+            if account and self._doc_account.get(oid) != account:
+                continue
+            out.append((oid, score))
+            if len(out) >= limit:
+                break
+        return out
+
+    def search(self, query: str, limit: int = 20, account: str | None = None) -> list[tuple[str, int]]:
+        """Returns [(order_id, score), ...] best first, only orders of `account` if given."""
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            self._merge_locked()
+            expanded = []
+            for alts in terms:
+                matches = list(dict.fromkeys(t for a in alts for t in self._expand_locked(a)))
+                if not matches:
+                    return []
+                expanded.append((sum(len(self._postings[t]) for t in matches), alts, matches))
+            # rarest term first; later terms only probe the surviving candidates
+            expanded.sort(key=lambda e: e[0])
+
+            size, alts, matches = expanded[0]
+            if len(expanded) == 1:
+                return self._top_locked(alts, matches, size, limit, account)
+            scores = dict(self._top_locked(alts, matches, size, MAX_CANDIDATES, account))
+
+            for size, alts, matches in expanded[1:]:
+                per_order = {}
+                if len(matches) <= 8:
+                    # a few tokens: look each candidate up in their postings
+                    postings = [(self._postings[t], 2 if t in alts else 1) for t in matches]
+                    for order_id in scores:
+                        best = max((p[order_id] * bonus for p, bonus in postings if order_id in p), default=0)
+                        if best:
+                            per_order[order_id] = best
+                elif len(scores) * 32 < size:
+                    # few candidates left: check each candidate's own tokens instead
+                    for order_id in scores:
+                        best = 0
+                        for t, w in self._doc_tokens[order_id].items():
+                            if t.startswith(alts):
+                                best = max(best, w * (2 if t in alts else 1))
+                        if best:
+                            per_order[order_id] = best
+                else:
+                    for t in matches:
+                        bonus = 2 if t in alts else 1
+                        for order_id, w in self._postings[t].items():
+                            sc = w * bonus
+                            if per_order.get(order_id, 0) < sc:
+                                per_order[order_id] = sc
+                scores = {oid: sc + per_order[oid] for oid, sc in scores.items() if oid in per_order}
+                if not scores:
+                    return []
+            # highest score first, newest order first within the same score
+            return heapq.nlargest(limit, scores.items(),
+                                  key=lambda kv: (kv[1], self._doc_rank.get(kv[0], "")))
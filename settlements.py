@@ -0,0 +1,112 @@
+"""
+Bulk ingest of Daraz finance transactions for settlement reconciliation.
+
+Instead of one /finance/transaction/details/get call per order, a statement period is
+fetched in date windows of window_days, each paged with offset/limit until a short
+page. Rows are normalized to the tqm_finance_transactions shape with a stable tx_key,
+so re-ingesting a period updates rows in place (e.g. paid_status flipping to "Yes"
+once Daraz pays the statement out).
+
+Matching statements against vendor liabilities lives in main.py, next to the cost data.
+"""
+import hashlib
+from datetime import date, datetime, timedelta
+
+# Daraz has returned transaction_date in more than one shape over time
+_DATE_FORMATS = ("%Y-%m-%d", "%d %b %Y", "%d-%b-%Y", "%Y/%m/%d")
+# The sale row of an order. The statement holding it carries the order's vendor liability.
+PRICE_FEE_NAME = "Product Price Paid by Buyer"
+
+
+def parse_tx_date(value) -> date | None:
+    s = str(value or "").strip()
+    if not s:
+        return None
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(s[:11].strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def windows(start: date, end: date, days: int = 7):
+    """Consecutive inclusive (window_start, window_end) date pairs covering start..end."""
+    step = timedelta(days=max(1, int(days)))
+    ws = start
+    while ws <= end:
+        we = min(end, ws + step - timedelta(days=1))
+        yield ws, we
+        ws = we + timedelta(days=1)
+
+
+def is_paid(paid_status) -> bool:
+    return str(paid_status or "").strip().lower() in ("yes", "paid")
+
+
+def normalize(account: str, row: dict, to_decimal, occurrence: int = 0) -> dict:
+    """
+    One raw finance row -> a tqm_finance_transactions row, amount parsed with
+    to_decimal (main._d). tx_key comes from Daraz's transaction_number when present;
+    otherwise from the row's identifying fields plus `occurrence` (how many identical
+    rows came before it in the same window).
+    """
+    order_id = str(row.get("order_no") or row.get("trade_order_id") or "").strip()
+    item_id = str(row.get("orderItem_no") or row.get("order_item_id") or "").strip()
+    fee_name = (row.get("fee_name") or "").strip()
+    tx_type = (row.get("transaction_type") or "").strip()
+    tx_date = parse_tx_date(row.get("transaction_date"))
+    amount = to_decimal(row.get("amount"))
+
+    number = str(row.get("transaction_number") or "").strip()
+    if number:
+        ident = f"{account}|{number}"
+    else:
+        ident = f"{account}|{order_id}|{item_id}|{fee_name}|{tx_type}|{tx_date}|{amount}#{occurrence}"
+    return {
+        "tx_key": hashlib.sha1(ident.encode("utf-8")).hexdigest(),
+        "account": account,
+        "statement": (row.get("statement") or "").strip(),
+        "trade_order_id": order_id,
+        "order_item_id": item_id,
+        "transaction_date": tx_date,
+        "transaction_type": tx_type,
+        "fee_name": fee_name,
+        "amount": amount,
+        "paid": is_paid(row.get("paid_status")),
+    }
+
+
+def ingest_period(fetch_page, account: str, start: date, end: date, store, to_decimal,
+                  window_days: int = 7, page_limit: int = 500) -> dict:
+    """
+    Pull every finance transaction dated start..end (inclusive).
+      fetch_page(window_start, window_end, offset, limit) -> list of raw rows
+      store(list of normalized rows) is called once per non-empty page.
+      to_decimal(value) -> Decimal parses amounts (see normalize).
+    Returns {"windows", "pages", "rows"}.
+    """
+    summary = {"windows": 0, "pages": 0, "rows": 0}
+    for ws, we in windows(start, end, window_days):
+        seen = {}  # fallback identity -> occurrences so far in this window
+        offset = 0
+        while True:
+            raw = fetch_page(ws, we, offset, page_limit)
+            summary["pages"] += 1
+            rows = []
+            for r in raw:
+                base = normalize(account, r, to_decimal)
+                if str(r.get("transaction_number") or "").strip():
+                    rows.append(base)
+                    continue
+                n = seen.get(base["tx_key"], 0)
+                seen[base["tx_key"]] = n + 1
+                rows.append(normalize(account, r, to_decimal, n) if n else base)
+            if rows:
+                store(rows)
+                summary["rows"] += len(rows)
+            if len(raw) < page_limit:
+                break
+            offset += page_limit
+        summary["windows"] += 1
+    return summary
@@ -0,0 +1,39 @@
+-- Change feed for keeping several app instances' caches coherent (see _sync_db_changes).
+--
+-- Every cost or payment write increments tqm_data_version.version and stamps the rows
+-- it writes with the new value, in the same transaction. The UPDATE holds the version
+-- row's lock until commit, so writers commit in version order and an instance that
+-- reads version N can fetch exactly the rows with last_seen < version <= N.
+-- Existing rows keep version 0 and are picked up by each instance's initial load.
+IF OBJECT_ID('dbo.tqm_data_version') IS NULL
+BEGIN
+    CREATE TABLE dbo.tqm_data_version (
+        id INT NOT NULL CONSTRAINT PK_tqm_data_version PRIMARY KEY CHECK (id = 1),
+        version BIGINT NOT NULL
+    );
+    INSERT INTO dbo.tqm_data_version (id, version) VALUES (1, 0);
+END
+GO
+
+IF COL_LENGTH('dbo.tqm_product_costs', 'version') IS NULL
+    ALTER TABLE dbo.tqm_product_costs
+        ADD version BIGINT NOT NULL CONSTRAINT DF_tqm_product_costs_version DEFAULT 0;
+GO
+
+IF COL_LENGTH('dbo.vendor_payments', 'version') IS NULL
+    ALTER TABLE dbo.vendor_payments
+        ADD version BIGINT NOT NULL CONSTRAINT DF_vendor_payments_version DEFAULT 0;
+GO
+
+-- Incremental fetches are range seeks on version
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_tqm_product_costs_version'
+               AND object_id = OBJECT_ID('dbo.tqm_product_costs'))
+CREATE NONCLUSTERED INDEX IX_tqm_product_costs_version
+    ON dbo.tqm_product_costs (version)
+    INCLUDE (product_cost, packaging, vendor);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_vendor_payments_version'
+               AND object_id = OBJECT_ID('dbo.vendor_payments'))
+CREATE NONCLUSTERED INDEX IX_vendor_payments_version
+    ON dbo.vendor_payments (version)
+    INCLUDE (vendor, amount, payment_date);
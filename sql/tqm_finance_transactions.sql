@@ -0,0 +1,42 @@
+-- Local copy of Daraz finance transactions for settlement reconciliation (/api/settlements).
+--
+-- Filled in bulk per statement period by _ingest_settlements (paged
+-- /finance/transaction/details/get windows). tx_key is a hash of Daraz's
+-- transaction_number (or of the row's identifying fields when that is missing), so
+-- re-ingesting a period updates rows in place instead of duplicating them.
+IF OBJECT_ID('dbo.tqm_finance_transactions') IS NULL
+CREATE TABLE dbo.tqm_finance_transactions (
+    tx_key CHAR(40) NOT NULL CONSTRAINT PK_tqm_finance_transactions PRIMARY KEY,
+    account NVARCHAR(64) NOT NULL,
+    statement NVARCHAR(128) NOT NULL,
+    trade_order_id NVARCHAR(32) NOT NULL,
+    order_item_id NVARCHAR(32) NOT NULL,
+    transaction_date DATE NULL,
+    transaction_type NVARCHAR(128) NOT NULL,
+    fee_name NVARCHAR(128) NOT NULL,
+    amount DECIMAL(14, 2) NOT NULL,
+    paid BIT NOT NULL,
+    ingested_at DATETIME2 NOT NULL CONSTRAINT DF_tqm_finance_transactions_ingested_at DEFAULT SYSUTCDATETIME()
+);
+GO
+
+-- Per-statement rollups: one ordered range scan per (account, statement)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_tqm_finance_tx_account_statement'
+               AND object_id = OBJECT_ID('dbo.tqm_finance_transactions'))
+CREATE NONCLUSTERED INDEX IX_tqm_finance_tx_account_statement
+    ON dbo.tqm_finance_transactions (account, statement, trade_order_id)
+    INCLUDE (amount, paid, transaction_date);
+
+-- Per-order lookups (/api/settlements/order/<order_id>)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_tqm_finance_tx_trade_order_id'
+               AND object_id = OBJECT_ID('dbo.tqm_finance_transactions'))
+CREATE NONCLUSTERED INDEX IX_tqm_finance_tx_trade_order_id
+    ON dbo.tqm_finance_transactions (trade_order_id)
+    INCLUDE (account, statement, transaction_date, transaction_type, fee_name, amount, paid);
+
+-- Finding the statements that fall in a date range (month-end close)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_tqm_finance_tx_account_date'
+               AND object_id = OBJECT_ID('dbo.tqm_finance_transactions'))
+CREATE NONCLUSTERED INDEX IX_tqm_finance_tx_account_date
+    ON dbo.tqm_finance_transactions (account, transaction_date)
+    INCLUDE (statement);
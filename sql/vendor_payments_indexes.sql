@@ -0,0 +1,44 @@
+-- Stored running balance and supporting indexes for the paged payment history (/api/get_payments).
+--
+-- _load_db_vendor_payments filters on user_id (+ optional vendor / payment_date range)
+-- and pages with a keyset cursor on (timestamp, id) DESC. Each row carries the vendor's
+-- running balance (total paid up to and including it), written by _save_db_payment, so
+-- a page reads only its own rows instead of re-summing the user's whole history.
+
+-- 1. balance column, backfilled for existing rows (run before deploying the new code;
+--    rows still NULL are handled by _save_db_payment but show no balance in the history)
+IF COL_LENGTH('dbo.vendor_payments', 'balance') IS NULL
+    ALTER TABLE dbo.vendor_payments ADD balance DECIMAL(14, 2) NULL;
+GO
+
+WITH b AS (
+    SELECT balance,
+           SUM(amount) OVER (PARTITION BY user_id, vendor ORDER BY [timestamp], id
+                             ROWS UNBOUNDED PRECEDING) AS running
+    FROM dbo.vendor_payments
+)
+UPDATE b SET balance = running WHERE balance IS NULL;
+GO
+
+-- 2. Vendor-filtered pages, and the last-balance lookup on insert: one ordered range
+--    seek on (user_id, vendor) read backwards, no sort, no key lookups.
+IF EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_vendor_payments_user_vendor_ts_id'
+           AND object_id = OBJECT_ID('dbo.vendor_payments'))
+CREATE NONCLUSTERED INDEX IX_vendor_payments_user_vendor_ts_id
+    ON dbo.vendor_payments (user_id, vendor, [timestamp], id)
+    INCLUDE (amount, payment_date, balance)
+    WITH (DROP_EXISTING = ON);
+ELSE
+CREATE NONCLUSTERED INDEX IX_vendor_payments_user_vendor_ts_id
+    ON dbo.vendor_payments (user_id, vendor, [timestamp], id)
+    INCLUDE (amount, payment_date, balance);
+GO
+
+-- 3. All-vendor pages order across vendors, which the index above cannot serve without a
+--    sort; this one gives them the same ordered seek. payment_date range filters are
+--    residual predicates on either index.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_vendor_payments_user_ts_id'
+               AND object_id = OBJECT_ID('dbo.vendor_payments'))
+CREATE NONCLUSTERED INDEX IX_vendor_payments_user_ts_id
+    ON dbo.vendor_payments (user_id, [timestamp], id)
+    INCLUDE (vendor, amount, payment_date, balance);
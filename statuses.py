@@ -0,0 +1,190 @@
+"""
+Order / item status classification, done once when orders and traces are ingested.
+
+Raw Daraz statuses ("ready_to_ship", "returned", ...) and tracking titles ("In Transit",
+"Package Returned", ...) map to a Status code plus StatusFlag bits, so the dashboard's
+math and filters test integers instead of re-scanning strings on every render.
+
+Titles missing from KNOWN_TITLES still get flags from the same keyword rules the
+dashboard has always used ("return" => returned, ...) and are counted in UNKNOWN_TITLES
+so they can be added to the table.
+"""
+import enum
+import threading
+import time
+
+
+class Status(enum.IntEnum):
+    UNKNOWN = 0
+    UNPAID = 1
+    PENDING = 2
+    TO_PACK = 3
+    PACKED = 4
+    READY_TO_SHIP = 5
+    SHIPPED = 6
+    IN_TRANSIT = 7
+    DELIVERED = 8
+    DELIVERY_FAILED = 9
+    BUYER_DELIVERY_FAILED = 10
+    FAILED = 11
+    RETURNING = 12
+    RETURNED = 13
+    CANCELED = 14
+    LOST = 15
+    UNBOOKED = 16
+
+
+class StatusFlag(enum.IntFlag):
+    NONE = 0
+    RETURNED = 1  # product comes back: its cost is not owed to the vendor
+    FAILED = 2
+    DELIVERED = 4
+    UNBOOKED = 8  # no tracking number yet
+    TERMINAL = 16  # no further status changes expected
+
+
+# plain-int masks for hot loops: IntFlag operators cost several times more than int ones
+FLAG_RETURNED = int(StatusFlag.RETURNED)
+FLAG_FAILED = int(StatusFlag.FAILED)
+FLAG_DELIVERED = int(StatusFlag.DELIVERED)
+FLAG_UNBOOKED = int(StatusFlag.UNBOOKED)
+FLAG_TERMINAL = int(StatusFlag.TERMINAL)
+
+_F = StatusFlag
+_FLAGS = {
+    Status.DELIVERED: _F.DELIVERED | _F.TERMINAL,
+    Status.DELIVERY_FAILED: _F.FAILED,
+    Status.BUYER_DELIVERY_FAILED: _F.FAILED,
+    Status.FAILED: _F.FAILED | _F.TERMINAL,
+    Status.RETURNING: _F.RETURNED,
+    Status.RETURNED: _F.RETURNED | _F.TERMINAL,
+    Status.CANCELED: _F.TERMINAL,
+    Status.LOST: _F.TERMINAL,
+    Status.UNBOOKED: _F.UNBOOKED,
+}
+
+# normalized title (see normalize) -> Status. A title's RETURNED bit must agree with the
+# keyword rule ("return" in the title) so adding it here never changes vendor liability;
+# e.g. "shipped_back" stays unknown until that rule is revisited.
+KNOWN_TITLES = {
+    # Daraz order / order item statuses
+    "unpaid": Status.UNPAID,
+    "pending": Status.PENDING,
+    "confirmed": Status.PENDING,
+    "topack": Status.TO_PACK,
+    "packed": Status.PACKED,
+    "repacked": Status.PACKED,
+    "toship": Status.READY_TO_SHIP,
+    "ready to ship": Status.READY_TO_SHIP,
+    "ready to ship pending": Status.READY_TO_SHIP,
+    "shipped": Status.SHIPPED,
+    "delivered": Status.DELIVERED,
+    "failed": Status.FAILED,
+    "failed delivery": Status.DELIVERY_FAILED,
+    "returned": Status.RETURNED,
+    "canceled": Status.CANCELED,
+    "cancelled": Status.CANCELED,
+    "lost by 3pl": Status.LOST,
+    "damaged by 3pl": Status.LOST,
+    "package scrapped": Status.LOST,
+    # logistics trace titles
+    "order placed": Status.PENDING,
+    "picked up": Status.SHIPPED,
+    "in transit": Status.IN_TRANSIT,
+    "out for delivery": Status.IN_TRANSIT,
+    "delivery failed": Status.DELIVERY_FAILED,
+    "buyer delivery failed": Status.BUYER_DELIVERY_FAILED,
+    "return initiated": Status.RETURNING,
+    "return in transit": Status.RETURNING,
+    "package returned": Status.RETURNED,
+    "returned to seller": Status.RETURNED,
+    # set by _items_with_tracking for items without a tracking number
+    "un booked": Status.UNBOOKED,
+    "unbooked": Status.UNBOOKED,
+}
+
+MAX_UNKNOWN_TITLES = 1000
+
+_lock = threading.Lock()
+_memo = {}  # raw title -> (Status, StatusFlag)
+_labels = {}  # raw status -> display label
+UNKNOWN_TITLES = {}  # normalized title -> {"title", "count", "first_seen", "last_seen"}
+
+
+def normalize(title) -> str:
+    return " ".join(str(title or "").lower().replace("_", " ").replace("-", " ").split())
+
+
+def _keyword_flags(norm: str) -> StatusFlag:
+    # the rules the dashboard used before classification, kept for unknown titles
+    flags = _F.NONE
+    if "return" in norm:
+        flags |= _F.RETURNED
+    if "fail" in norm:
+        flags |= _F.FAILED
+    elif "delivered" in norm and not flags:
+        flags |= _F.DELIVERED | _F.TERMINAL
+    if "cancel" in norm:
+        flags |= _F.TERMINAL
+    return flags
+
+
+def _note_unknown(raw: str, norm: str):
+    now = time.time()
+    with _lock:
+        entry = UNKNOWN_TITLES.get(norm)
+        if entry is None:
+            if len(UNKNOWN_TITLES) >= MAX_UNKNOWN_TITLES:
+                return
+            entry = UNKNOWN_TITLES[norm] = {"title": raw, "count": 0, "first_seen": now, "last_seen": now}
+            print(f"[status] unknown status title: {raw!r}")
+        entry["count"] += 1
+        entry["last_seen"] = now
+
+
+def classify(title) -> tuple[Status, StatusFlag]:
+    """(Status, StatusFlag) for one raw status or tracking title; blank titles are UNKNOWN/NONE."""
+    raw = str(title or "")
+    hit = _memo.get(raw)
+    if hit is None:
+        norm = normalize(raw)
+        code = KNOWN_TITLES.get(norm, Status.UNKNOWN)
+        flags = _FLAGS.get(code, _F.NONE) if code != Status.UNKNOWN else _keyword_flags(norm)
+        hit = (code, flags)
+        if len(_memo) < MAX_UNKNOWN_TITLES * 10:
+            _memo[raw] = hit
+    if hit[0] == Status.UNKNOWN and raw.strip():
+        _note_unknown(raw, normalize(raw))
+    return hit
+
+
+def order_flags(statuses) -> StatusFlag:
+    """
+    Combined flags for an order's status list. At order level a buyer-failed delivery
+    also counts as RETURNED: the parcel goes back to the seller.
+    """
+    flags = _F.NONE
+    for s in statuses or ():
+        code, f = classify(s)
+        flags |= f
+        if code == Status.BUYER_DELIVERY_FAILED or (code == Status.UNKNOWN and "buyer delivery failed" in normalize(s)):
+            flags |= _F.RETURNED
+    return flags
+
+
+def display_label(title) -> str:
+    """'ready_to_ship' -> 'Ready To Ship' (memoized; statuses repeat across every order)."""
+    raw = str(title or "")
+    label = _labels.get(raw)
+    if label is None:
+        label = raw.replace('_', ' ').title()
+        if len(_labels) < MAX_UNKNOWN_TITLES * 10:
+            _labels[raw] = label
+    return label
+
+
+def unknown_titles() -> list[dict]:
+    """Unknown titles seen so far, most frequent first."""
+    with _lock:
+        rows = [dict(v, normalized=k) for k, v in UNKNOWN_TITLES.items()]
+    return sorted(rows, key=lambda r: -r["count"])
@@ -0,0 +1,223 @@
+"""
+On-disk thumbnail cache behind the /img/<hash> proxy.
+
+Product image URLs are registered at ingest (register() returns the hash used in the
+/img/ URL), fetched once, resized to THUMB_SIZE and stored as WebP or JPEG. The cache
+directory is kept under max_bytes by evicting the least recently served files.
+
+Resizing needs Pillow (in requirements.txt). If it is missing the original image bytes
+are cached and served as-is, which still saves the repeated CDN round trips, and a
+warning is printed when the store is created.
+
+The fetcher is any callable url -> (bytes, content_type); tests and benchmarks swap in
+a local stub (see bench.fake_daraz.stub_image_fetcher) instead of hitting the CDN.
+"""
+import hashlib
+import io
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+
+import requests
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are stored unresized without it (warned in ThumbnailStore)
+    Image = None
+
+HASH_RE = re.compile(r"^[0-9a-f]{32}$")
+_EXT = {"image/webp": "webp", "image/jpeg": "jpg", "image/png": "png", "image/gif": "gif"}
+_MIME = {v: k for k, v in _EXT.items()}
+
+
+def image_hash(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+
+
+def http_fetcher(url: str, timeout: float = 15) -> tuple[bytes, str]:
+    resp = requests.get(url, timeout=timeout)
+    resp.raise_for_status()
+    return resp.content, (resp.headers.get("Content-Type") or "").split(";")[0].strip()
+
+
+def fetcher_from_spec(spec: str | None):
+    """TQM_IMAGE_FETCHER spec "package.module:function" -> that callable; empty -> http_fetcher."""
+    if not spec:
+        return http_fetcher
+    import importlib
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def _webp_supported() -> bool:
+    if Image is None:
+        return False
+    try:
+        from PIL import features
+        return bool(features.check("webp"))
+    except Exception:
+        return False
+
+
+class ThumbnailStore(object):
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024, size: int = 160,
+                 fetcher=None, quality: int = 80):
+        self.cache_dir = cache_dir
+        self.max_bytes = max(0, int(max_bytes))
+        self.size = int(size)
+        self.quality = int(quality)
+        self.fetcher = fetcher or http_fetcher
+        self.webp = _webp_supported()
+        if Image is None:
+            print("[img] WARNING: Pillow is not installed; product images are cached full-size, "
+                  "not resized to thumbnails. Install it with 'pip install -r requirements.txt'.")
+        self._lock = threading.Lock()
+        self._urls = {}  # hash -> source url (registered at ingest)
+        self._files = None  # file name -> [size, last_used]; scanned lazily
+        self._total = 0
+        self._inflight = {}  # (hash, fmt) -> Event, so concurrent misses fetch once
+        self._prefetch_q = queue.Queue(maxsize=10000)
+        self._prefetch_seen = set()
+        self._prefetch_thread = None
+
+    # --- registry ---
+    def register(self, url: str) -> str:
+        h = image_hash(url)
+        self._urls[h] = url
+        return h
+
+    def source_url(self, h: str) -> str | None:
+        return self._urls.get(h)
+
+    # --- disk LRU ---
+    def _scan_locked(self):
+        if self._files is not None:
+            return
+        self._files, self._total = {}, 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".") or not os.path.isfile(path):
+                continue
+            st = os.stat(path)
+            self._files[name] = [st.st_size, st.st_mtime]
+            self._total += st.st_size
+
+    def _evict_locked(self):
+        if self._total <= self.max_bytes:
+            return
+        for name, (size, _) in sorted(self._files.items(), key=lambda kv: kv[1][1]):
+            if self._total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            del self._files[name]
+            self._total -= size
+
+    def _lookup(self, h: str, fmt: str) -> tuple[str, str] | None:
+        # thumbnail in the wanted format, else the unresized original (no Pillow at store time)
+        with self._lock:
+            self._scan_locked()
+            for ext in ((fmt,) if Image is not None else tuple(_MIME)):
+                name = f"{h}.{ext}"
+                entry = self._files.get(name)
+                if entry is not None:
+                    entry[1] = time.time()
+                    return os.path.join(self.cache_dir, name), _MIME[ext]
+        return None
+
+    def _store(self, name: str, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(self.cache_dir, name))
+        with self._lock:
+            old = self._files.get(name)
+            if old is not None:
+                self._total -= old[0]
+            self._files[name] = [len(data), time.time()]
+            self._total += len(data)
+            self._evict_locked()
+
+    def _render(self, raw: bytes, content_type: str, fmt: str) -> tuple[bytes, str]:
+        if Image is None:
+            ext = _EXT.get(content_type) or "jpg"
+            return raw, ext
+        img = Image.open(io.BytesIO(raw))
+        img.thumbnail((self.size, self.size))
+        out = io.BytesIO()
+        if fmt == "webp":
+            img.save(out, "WEBP", quality=self.quality)
+        else:
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img.save(out, "JPEG", quality=self.quality, optimize=True)
+        return out.getvalue(), fmt
+
+    # --- serving ---
+    def preferred_format(self, accept: str = "") -> str:
+        return "webp" if self.webp and "image/webp" in (accept or "") else "jpg"
+
+    def get(self, h: str, fmt: str = "jpg") -> tuple[str, str] | None:
+        """(path, mimetype) of the cached thumbnail, fetching it on a miss; None if unavailable."""
+        if not HASH_RE.match(h or ""):
+            return None
+        hit = self._lookup(h, fmt)
+        if hit is not None:
+            return hit
+        url = self._urls.get(h)
+        if not url:
+            return None
+
+        key = (h, fmt)
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+        if not owner:
+            event.wait(30)
+            return self._lookup(h, fmt)
+        try:
+            raw, content_type = self.fetcher(url)
+            data, ext = self._render(raw, content_type, fmt)
+            self._store(f"{h}.{ext}", data)
+        except Exception as e:
+            print(f"[img] failed to cache {url}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+        return self._lookup(h, fmt)
+
+    # --- prefetch (during sync) ---
+    def prefetch(self, urls):
+        """Queue images for background caching; never blocks the caller."""
+        for url in urls:
+            if not url:
+                continue
+            h = self.register(url)
+            if h in self._prefetch_seen:
+                continue
+            self._prefetch_seen.add(h)
+            try:
+                self._prefetch_q.put_nowait(h)
+            except queue.Full:
+                self._prefetch_seen.discard(h)
+                break
+        if self._prefetch_thread is None or not self._prefetch_thread.is_alive():
+            self._prefetch_thread = threading.Thread(target=self._prefetch_loop, name="tqm-img-prefetch",
+                                                     daemon=True)
+            self._prefetch_thread.start()
+
+    def _prefetch_loop(self):
+        fmt = "webp" if self.webp else "jpg"
+        while True:
+            h = self._prefetch_q.get()
+            self.get(h, fmt)